@@ -0,0 +1,17 @@
+-- Switch embeddings vector search from the ivfflat index to HNSW
+-- init.sql only runs on a fresh database; apply this to existing ones.
+-- Requires pgvector >= 0.5 for HNSW; >= 0.8 for hnsw.iterative_scan (see HNSW_ITERATIVE_SCAN)
+
+-- 1. Build the HNSW index first, so searches keep an index while it is built
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_embeddings_embedding_hnsw
+ON embeddings USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
+
+-- 2. Drop the old vector index (ivfflat from init.sql, or the tenant covering index
+-- from add_composite_indexes.sql); idx_embeddings_tenant_id still serves tenant filters
+DROP INDEX CONCURRENTLY IF EXISTS idx_embeddings_tenant_vector;
+
+-- Check the new index is used by vector searches:
+--
+-- EXPLAIN SELECT content FROM embeddings
+-- ORDER BY embedding <=> (SELECT embedding FROM embeddings LIMIT 1)
+-- LIMIT 4;
@@ -7,6 +7,7 @@ from login_page import login_page
 from signup_page import signup_page
 from auth import CognitoAuth, require_auth
 from config import config
+from rag import warm_up_models
 import asyncio
 import nest_asyncio
 import sys
@@ -31,6 +32,9 @@ st.set_page_config(
     initial_sidebar_state="collapsed"  # Faster initial load
 )
 
+# Load the Ollama models once per process so the first question doesn't pay for it
+warm_up_models()
+
 # Configure file upload limits and performance settings
 st.session_state.setdefault('max_upload_size', 200)  # 200MB default
 
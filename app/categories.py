@@ -1,8 +1,9 @@
 """
 Category management and normalization for RAG system
 """
-from fuzzywuzzy import process
+from rapidfuzz import fuzz, process, utils
 from sklearn.feature_extraction.text import TfidfVectorizer
+from functools import lru_cache
 import json
 import os
 
@@ -65,14 +66,25 @@ class CategoryManager:
         self.vectorizer = TfidfVectorizer(analyzer='word', ngram_range=(1, 2))
         self.vectorizer.fit(all_synonyms)
         
-        # Create matrix of all synonyms
-        self.synonym_matrix = self.vectorizer.transform(all_synonyms)
-        
         # Map each synonym to its category
         self.synonym_to_category = {}
         for category, synonyms in self.categories.items():
             for synonym in synonyms:
                 self.synonym_to_category[synonym] = category
+        self.synonym_choices = list(self.synonym_to_category.keys())
+        
+        # Direct synonym hits resolve to the first category listing the synonym
+        self.direct_synonym_category = {}
+        for category, synonyms in self.categories.items():
+            for synonym in synonyms:
+                self.direct_synonym_category.setdefault(synonym, category)
+        
+        # Create matrix of all synonyms, one row per entry in synonym_choices so
+        # row indices line up even when a synonym is shared between categories
+        self.synonym_matrix = self.vectorizer.transform(self.synonym_choices)
+        
+        # Results depend on the synonym set, so start a fresh cache whenever it is rebuilt
+        self._cached_normalize = lru_cache(maxsize=50000)(self._normalize_category)
     
     def normalize_category(self, text, threshold=0.7):
         """
@@ -85,21 +97,27 @@ class CategoryManager:
         Returns:
             Tuple of (normalized_category, confidence_score)
         """
+        return self._cached_normalize(text.lower(), threshold)
+    
+    def _normalize_category(self, text_lower, threshold):
+        """Uncached lookup behind normalize_category"""
         # Try direct matching first
-        text_lower = text.lower()
-        
         # Check if text directly matches a category name
         if text_lower in self.categories:
             return text_lower, 1.0
             
         # Check if text directly matches a synonym
-        for category, synonyms in self.categories.items():
-            if text_lower in synonyms:
-                return category, 1.0
+        if text_lower in self.direct_synonym_category:
+            return self.direct_synonym_category[text_lower], 1.0
         
         # Try fuzzy matching
-        best_match = process.extractOne(text_lower, list(self.synonym_to_category.keys()))
-        if best_match and best_match[1] >= threshold * 100:  # fuzzywuzzy returns percentage
+        best_match = process.extractOne(
+            text_lower,
+            self.synonym_choices,
+            processor=utils.default_process,
+            score_cutoff=threshold * 100  # rapidfuzz scores are percentages
+        )
+        if best_match:
             return self.synonym_to_category[best_match[0]], best_match[1] / 100
             
         # Try semantic matching with TF-IDF
@@ -117,7 +135,7 @@ class CategoryManager:
             
             if best_score >= threshold:
                 # Get the synonym and its category
-                best_synonym = list(self.synonym_to_category.keys())[best_idx]
+                best_synonym = self.synonym_choices[best_idx]
                 return self.synonym_to_category[best_synonym], best_score
         except Exception as e:
             print(f"Error in semantic matching: {str(e)}")
@@ -125,6 +143,66 @@ class CategoryManager:
         # No good match found
         return None, 0.0
     
+    def normalize_category_batch(self, texts, threshold=0.7):
+        """
+        Normalize several texts at once, with the same results as normalize_category
+        
+        Args:
+            texts: Texts to categorize
+            threshold: Similarity threshold (0-1)
+            
+        Returns:
+            List of (normalized_category, confidence_score) tuples in input order
+        """
+        texts_lower = [text.lower() for text in texts]
+        results = [None] * len(texts_lower)
+        
+        # Direct category and synonym matches
+        pending = []
+        for i, text_lower in enumerate(texts_lower):
+            if text_lower in self.categories:
+                results[i] = (text_lower, 1.0)
+            elif text_lower in self.direct_synonym_category:
+                results[i] = (self.direct_synonym_category[text_lower], 1.0)
+            else:
+                pending.append(i)
+        if not pending:
+            return results
+        
+        # Fuzzy matching for all remaining texts in one score matrix
+        scores = process.cdist(
+            [texts_lower[i] for i in pending],
+            self.synonym_choices,
+            scorer=fuzz.WRatio,
+            processor=utils.default_process,
+            score_cutoff=threshold * 100
+        )
+        best_indices = scores.argmax(axis=1)
+        unmatched = []
+        for row, i in enumerate(pending):
+            best_score = scores[row, best_indices[row]]
+            if best_score > 0:
+                best_synonym = self.synonym_choices[best_indices[row]]
+                results[i] = (self.synonym_to_category[best_synonym], best_score / 100)
+            else:
+                unmatched.append(i)
+        
+        # Semantic matching with TF-IDF; rows are L2-normalized so the product is cosine similarity
+        if unmatched:
+            try:
+                text_vectors = self.vectorizer.transform([texts_lower[i] for i in unmatched])
+                similarities = (text_vectors @ self.synonym_matrix.T).toarray()
+                best_indices = similarities.argmax(axis=1)
+                for row, i in enumerate(unmatched):
+                    best_score = similarities[row, best_indices[row]]
+                    if best_score >= threshold:
+                        best_synonym = self.synonym_choices[best_indices[row]]
+                        results[i] = (self.synonym_to_category[best_synonym], best_score)
+            except Exception as e:
+                print(f"Error in semantic matching: {str(e)}")
+        
+        return [result if result is not None else (None, 0.0) for result in results]
+    
     def get_all_categories(self):
         """Get all available categories"""
         return list(self.categories.keys())
@@ -0,0 +1,102 @@
+"""
+Parsing of the structured sections written into normalized chunks
+"""
+from functools import lru_cache
+import re
+
+# Bumped whenever parse_chunk_fields changes shape or output, so stale stored fields are re-parsed
+FIELDS_VERSION = 3
+
+# Contact information patterns, compiled once. Stdlib re, not RE2: RE2's \w, \d
+# and \b are ASCII-only, which would cut non-ASCII hosts such as café.example.org short
+EMAIL_RE = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b')
+PHONE_RE = re.compile(r'\b(\(\d{3}\)\s*|\d{3}[-.])\d{3}[-.]?\d{4}\b|\b\d{3}[-.]?\d{3}[-.]?\d{4}\b')
+URL_RE = re.compile(r'https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+')
+# All three in one alternation, for scanning free text in a single pass
+CONTACT_RE = re.compile(
+    f"(?P<emails>{EMAIL_RE.pattern})|(?P<phones>{PHONE_RE.pattern})|(?P<websites>{URL_RE.pattern})"
+)
+
+# Section headers written by the ingest formatter, matched in one pass per chunk
+SECTION_HEADER_RE = re.compile(r'CATEGORIES:|CONTACT INFORMATION:|DESCRIPTION:|PROVIDER:')
+# Field labels inside a CONTACT INFORMATION section
+CONTACT_FIELD_RE = re.compile(r'Email:|Phone:|Website:|URL:|Address:')
+# Labels that end a multi-line address
+ADDRESS_END_RE = re.compile(r'Email:|Phone:|Website:|DESCRIPTION:')
+
+@lru_cache(maxsize=4096)
+def chunk_headers(chunk):
+    """Section headers present in a chunk, found with a single scan"""
+    return frozenset(SECTION_HEADER_RE.findall(chunk))
+
+def find_phones(text):
+    """Whole phone numbers; findall would return only the pattern's first group"""
+    return [match.group() for match in PHONE_RE.finditer(text)]
+
+def parse_sections(chunk):
+    """
+    Category labels from CATEGORIES: lines, as written, and the contact details
+    listed under CONTACT INFORMATION:, collected in one walk over the chunk's lines
+    """
+    categories = []
+    contact = {"emails": [], "phones": [], "websites": [], "addresses": []}
+    headers = chunk_headers(chunk)
+    has_categories = "CATEGORIES:" in headers
+    has_contact = "CONTACT INFORMATION:" in headers
+    if not (has_categories or has_contact):
+        return categories, contact
+
+    lines = chunk.split('\n')
+    for i, line in enumerate(lines):
+        if has_categories and "CATEGORIES:" in line:
+            cats = line.replace("CATEGORIES:", "").strip()
+            categories.extend(c.strip() for c in cats.split(','))
+        if not has_contact:
+            continue
+        # One scan finds every label on the line; most lines have none
+        fields = CONTACT_FIELD_RE.findall(line)
+        if not fields:
+            continue
+        if "Email:" in fields:
+            contact["emails"].extend(EMAIL_RE.findall(line))
+        elif "Phone:" in fields:
+            contact["phones"].extend(find_phones(line))
+        elif "Website:" in fields or "URL:" in fields:
+            contact["websites"].extend(URL_RE.findall(line))
+        elif "Address:" in fields and i+1 < len(lines):
+            # Address might span multiple lines
+            contact["addresses"].append(line.replace("Address:", "").strip())
+            if not ADDRESS_END_RE.search(lines[i+1]):
+                contact["addresses"].append(lines[i+1].strip())
+    return categories, contact
+
+def parse_raw_contacts(chunk):
+    """Contact details found anywhere in a chunk's text"""
+    contacts = {"emails": [], "phones": [], "websites": []}
+    for match in CONTACT_RE.finditer(chunk):
+        contacts[match.lastgroup].append(match.group())
+    return contacts
+
+def parse_provider(chunk):
+    """Provider name from a chunk's PROVIDER: line, or None without one"""
+    if "PROVIDER:" not in chunk_headers(chunk):
+        return None
+    return chunk.split("PROVIDER:")[1].split('\n')[0].strip()
+
+def parse_description(chunk):
+    """Text of a chunk's DESCRIPTION: section, or None without one"""
+    if "DESCRIPTION:" not in chunk_headers(chunk):
+        return None
+    return chunk.split("DESCRIPTION:")[1].strip()
+
+def parse_chunk_fields(chunk):
+    """All structured fields of a chunk, in the form stored in embeddings.meta_data"""
+    categories, contact = parse_sections(chunk)
+    return {
+        "version": FIELDS_VERSION,
+        "provider": parse_provider(chunk),
+        "description": parse_description(chunk),
+        "categories": categories,
+        "contact": contact,
+        "raw_contact": parse_raw_contacts(chunk)
+    }
@@ -1,5 +1,6 @@
 import os
-from typing import Dict, Any
+import types
+from typing import Mapping, Any
 import streamlit as st
 
 @st.cache_data(ttl=3600)  # Cache for 1 hour
@@ -74,6 +75,38 @@ def load_environment_config():
     
     return config_data
 
+# How it works steps - resolved once at import since env vars don't change at runtime
+HOW_IT_WORKS_STEPS = (
+    types.MappingProxyType({
+        'number': '1',
+        'icon': '📁',
+        'title': os.getenv('STEP_1_TITLE', 'Upload'),
+        'desc': os.getenv('STEP_1_DESC', 'Drag & drop your documents'),
+        'details': os.getenv('STEP_1_DETAILS', '- PDFs, Word docs, text files\n- Research papers & reports\n- Legal documents & contracts')
+    }),
+    types.MappingProxyType({
+        'number': '2',
+        'icon': '🤖',
+        'title': os.getenv('STEP_2_TITLE', 'Process'),
+        'desc': os.getenv('STEP_2_DESC', 'AI analyzes your content'),
+        'details': os.getenv('STEP_2_DETAILS', '- Intelligent text extraction\n- Semantic understanding\n- Citation mapping')
+    }),
+    types.MappingProxyType({
+        'number': '3',
+        'icon': '💬',
+        'title': os.getenv('STEP_3_TITLE', 'Ask'),
+        'desc': os.getenv('STEP_3_DESC', 'Query in natural language'),
+        'details': os.getenv('STEP_3_DETAILS', '- "What are the key findings?"\n- "Compare methodology across papers"\n- "Find contradicting evidence"')
+    }),
+    types.MappingProxyType({
+        'number': '4',
+        'icon': '✨',
+        'title': os.getenv('STEP_4_TITLE', 'Get Answers'),
+        'desc': os.getenv('STEP_4_DESC', 'Receive intelligent responses'),
+        'details': os.getenv('STEP_4_DETAILS', '- Accurate, contextual answers\n- Source citations included\n- Export to reports')
+    })
+)
+
 class AppConfig:
     """Configuration class for white-label application settings"""
     
@@ -116,56 +149,36 @@ class AppConfig:
         self.CTA_PRIMARY_TEXT = os.getenv('CTA_PRIMARY_TEXT', 'GET STARTED FREE')
         self.CTA_SECONDARY_TEXT = os.getenv('CTA_SECONDARY_TEXT', 'START FREE TRIAL')
         self.CTA_TRIAL_TEXT = os.getenv('CTA_TRIAL_TEXT', f'Start your {self.FREE_TRIAL_DAYS}-day free trial')
-    
-    def get_starter_plan_features(self) -> list:
-        """Get starter plan features as a list"""
-        features_env = os.getenv('STARTER_PLAN_FEATURES', 
+        
+        # Precompute list-valued settings so the getters don't re-parse them per render
+        features_env = os.getenv('STARTER_PLAN_FEATURES',
             f'{self.STARTER_PLAN_PAGES} pages processed/{self.STARTER_PLAN_PERIOD}|Unlimited questions|Document management dashboard|Export capabilities|Email support')
-        return [f"✅ {feature.strip()}" for feature in features_env.split('|')]
-    
-    def get_trial_benefits(self) -> list:
-        """Get trial benefits as a list"""
+        self._starter_plan_features = tuple(f"✅ {feature.strip()}" for feature in features_env.split('|'))
+        
         benefits_env = os.getenv('TRIAL_BENEFITS',
             f'Process up to {self.STARTER_PLAN_PAGES} pages|Unlimited questions and queries|Full document management dashboard|Export capabilities|Email support|All features unlocked for {self.FREE_TRIAL_DAYS} days')
-        return [f"✅ {benefit.strip()}" for benefit in benefits_env.split('|')]
+        self._trial_benefits = tuple(f"✅ {benefit.strip()}" for benefit in benefits_env.split('|'))
+        
+        # Attributes are fixed from here on, so snapshot them once for to_dict
+        self._dict_cache = types.MappingProxyType(
+            {key: value for key, value in self.__dict__.items() if not key.startswith('_')}
+        )
+    
+    def get_starter_plan_features(self) -> tuple:
+        """Get starter plan features as a tuple"""
+        return self._starter_plan_features
     
-    def get_how_it_works_steps(self) -> list:
+    def get_trial_benefits(self) -> tuple:
+        """Get trial benefits as a tuple"""
+        return self._trial_benefits
+    
+    def get_how_it_works_steps(self) -> tuple:
         """Get how it works steps"""
-        steps = [
-            {
-                'number': '1',
-                'icon': '📁',
-                'title': os.getenv('STEP_1_TITLE', 'Upload'),
-                'desc': os.getenv('STEP_1_DESC', 'Drag & drop your documents'),
-                'details': os.getenv('STEP_1_DETAILS', '- PDFs, Word docs, text files\n- Research papers & reports\n- Legal documents & contracts')
-            },
-            {
-                'number': '2',
-                'icon': '🤖',
-                'title': os.getenv('STEP_2_TITLE', 'Process'),
-                'desc': os.getenv('STEP_2_DESC', 'AI analyzes your content'),
-                'details': os.getenv('STEP_2_DETAILS', '- Intelligent text extraction\n- Semantic understanding\n- Citation mapping')
-            },
-            {
-                'number': '3',
-                'icon': '💬',
-                'title': os.getenv('STEP_3_TITLE', 'Ask'),
-                'desc': os.getenv('STEP_3_DESC', 'Query in natural language'),
-                'details': os.getenv('STEP_3_DETAILS', '- "What are the key findings?"\n- "Compare methodology across papers"\n- "Find contradicting evidence"')
-            },
-            {
-                'number': '4',
-                'icon': '✨',
-                'title': os.getenv('STEP_4_TITLE', 'Get Answers'),
-                'desc': os.getenv('STEP_4_DESC', 'Receive intelligent responses'),
-                'details': os.getenv('STEP_4_DETAILS', '- Accurate, contextual answers\n- Source citations included\n- Export to reports')
-            }
-        ]
-        return steps
-    
-    def to_dict(self) -> Dict[str, Any]:
-        """Convert configuration to dictionary for easy access"""
-        return {key: value for key, value in self.__dict__.items() if not key.startswith('_')}
+        return HOW_IT_WORKS_STEPS
+    
+    def to_dict(self) -> Mapping[str, Any]:
+        """Convert configuration to a read-only mapping for easy access"""
+        return self._dict_cache
 
 # Global configuration instance
 config = AppConfig()
\ No newline at end of file
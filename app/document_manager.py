@@ -4,6 +4,34 @@ from db import engine
 from sqlalchemy import text
 from auth import CognitoAuth
 import json
+import re
+
+# Markers that identify the start of a document's first chunk
+DOCUMENT_HEADER_INDICATORS = (
+    "CATEGORIES:",
+    "CONTACT INFORMATION:",
+    "DESCRIPTION:",
+    "File:",
+    "Document:",
+    "Title:",
+    "Organization:"
+)
+DOCUMENT_HEADER_PATTERN = re.compile("|".join(re.escape(i) for i in DOCUMENT_HEADER_INDICATORS))
+
+# Chunks for a tenant with aggregated stats, newest first
+LOAD_DOCS_SQL = text("""
+    SELECT 
+        content,
+        created_at,
+        LENGTH(content) as content_length,
+        (embedding IS NOT NULL) as has_embedding
+    FROM embeddings 
+    WHERE tenant_id = :tenant
+    ORDER BY created_at DESC
+""")
+
+# Lines containing any of these are category/contact lines, not titles
+TITLE_SKIP_PATTERN = re.compile(r"CATEGORIES:|CONTACT:|Email:|Phone:")
 
 def document_manager_page():
     """Document management and status viewing page"""
@@ -24,8 +52,15 @@ def document_manager_page():
     st.info(f"👤 **Logged in as:** {username}")
     st.info(f"🏢 **Managing workspace:** {tenant_id[:8]}...")
     
-    if st.button("Load Documents", type="primary"):
-        load_document_data(tenant_id)
+    col1, col2 = st.columns([1, 1])
+    with col1:
+        if st.button("Load Documents", type="primary"):
+            load_document_data(tenant_id)
+    with col2:
+        if st.button("🔄 Refresh"):
+            # Drop cached results so the next load hits the database
+            _fetch_documents.clear()
+            load_document_data(tenant_id)
     
     # Show document data if available
     if 'document_data' in st.session_state:
@@ -34,109 +69,114 @@ def document_manager_page():
 def load_document_data(tenant_id):
     """Load document data from the database"""
     try:
-        with engine.connect() as conn:
-            # Get embedding data with aggregated stats
-            result = conn.execute(
-                text("""
-                    SELECT 
-                        content,
-                        created_at,
-                        LENGTH(content) as content_length,
-                        (embedding IS NOT NULL) as has_embedding
-                    FROM embeddings 
-                    WHERE tenant_id = :tenant
-                    ORDER BY created_at DESC
-                """),
-                {"tenant": tenant_id}
-            )
-            
-            rows = result.fetchall()
-            
-            if rows:
-                # Process the data
-                documents = []
-                current_doc = None
-                
-                for row in rows:
-                    content = row[0]
-                    created_at = row[1]
-                    content_length = row[2]
-                    has_embedding = row[3]
-                    
-                    # Try to identify separate documents by looking for document headers
-                    if is_document_header(content):
-                        # This looks like a new document
-                        if current_doc:
-                            documents.append(current_doc)
-                        
-                        current_doc = {
-                            'title': extract_document_title(content),
-                            'created_at': created_at,
-                            'chunks': 1,
-                            'total_length': content_length,
-                            'has_embeddings': has_embedding,
-                            'preview': content[:200] + "..." if len(content) > 200 else content
-                        }
-                    else:
-                        # This is likely a chunk from the current document
-                        if current_doc:
-                            current_doc['chunks'] += 1
-                            current_doc['total_length'] += content_length
-                        else:
-                            # Fallback - create a document entry
-                            current_doc = {
-                                'title': f"Document from {created_at.strftime('%Y-%m-%d %H:%M')}",
-                                'created_at': created_at,
-                                'chunks': 1,
-                                'total_length': content_length,
-                                'has_embeddings': has_embedding,
-                                'preview': content[:200] + "..." if len(content) > 200 else content
-                            }
-                
-                # Add the last document
-                if current_doc:
-                    documents.append(current_doc)
-                
-                st.session_state.document_data = documents
-                st.success(f"Loaded {len(documents)} documents with {sum(d['chunks'] for d in documents)} total chunks")
-            else:
-                st.warning(f"No documents found for tenant: {tenant_id}")
-                st.session_state.document_data = []
+        documents = _fetch_documents(tenant_id)
+        
+        if documents:
+            st.session_state.document_data = documents
+            # Build the display table once per load rather than on every rerun
+            st.session_state.document_df = _build_display_df(documents)
+            st.success(f"Loaded {len(documents)} documents with {sum(d['chunks'] for d in documents)} total chunks")
+        else:
+            st.warning(f"No documents found for tenant: {tenant_id}")
+            st.session_state.document_data = []
+            st.session_state.pop('document_df', None)
                 
     except Exception as e:
         st.error(f"Error loading documents: {str(e)}")
         st.session_state.document_data = []
+        st.session_state.pop('document_df', None)
+
+@st.cache_data(ttl=60, show_spinner=False)  # Cache per tenant for 1 minute
+def _fetch_documents(tenant_id):
+    """Query and aggregate the tenant's chunks into documents (cached)"""
+    with engine.connect() as conn:
+        # Get embedding data with aggregated stats
+        result = conn.execute(LOAD_DOCS_SQL, {"tenant": tenant_id})
+        
+        rows = result.fetchall()
+    
+    # Process the data
+    documents = []
+    current_doc = None
+    
+    for row in rows:
+        content = row[0]
+        created_at = row[1]
+        content_length = row[2]
+        has_embedding = row[3]
+        
+        # Try to identify separate documents by looking for document headers
+        if is_document_header(content):
+            # This looks like a new document
+            if current_doc:
+                documents.append(current_doc)
+            
+            current_doc = {
+                'title': extract_document_title(content),
+                'created_at': created_at,
+                'chunks': 1,
+                'total_length': content_length,
+                'has_embeddings': has_embedding,
+                'preview': content[:200] + "..." if len(content) > 200 else content
+            }
+        else:
+            # This is likely a chunk from the current document
+            if current_doc:
+                current_doc['chunks'] += 1
+                current_doc['total_length'] += content_length
+            else:
+                # Fallback - create a document entry
+                current_doc = {
+                    'title': f"Document from {created_at.strftime('%Y-%m-%d %H:%M')}",
+                    'created_at': created_at,
+                    'chunks': 1,
+                    'total_length': content_length,
+                    'has_embeddings': has_embedding,
+                    'preview': content[:200] + "..." if len(content) > 200 else content
+                }
+    
+    # Add the last document
+    if current_doc:
+        documents.append(current_doc)
+    
+    return documents
 
 def is_document_header(content):
     """Check if content looks like a document header/start"""
     # Look for structured data indicators or file-like headers
-    indicators = [
-        "CATEGORIES:",
-        "CONTACT INFORMATION:", 
-        "DESCRIPTION:",
-        "File:",
-        "Document:",
-        "Title:",
-        "Organization:"
-    ]
-    return any(indicator in content for indicator in indicators)
+    # Fast path: most headers open the chunk
+    if content.lstrip().startswith(DOCUMENT_HEADER_INDICATORS):
+        return True
+    # Normalized chunks lead with PROVIDER:, so indicators can also appear mid-chunk
+    return DOCUMENT_HEADER_PATTERN.search(content) is not None
 
 def extract_document_title(content):
     """Extract a meaningful title from document content"""
-    lines = content.split('\n')
-    
     # Look for title patterns
-    for line in lines[:5]:  # Check first 5 lines
+    for line in _first_lines(content, 5):  # Check first 5 lines
         line = line.strip()
         if line and len(line) > 10 and len(line) < 100:
             # Skip pure category/contact lines
-            if not any(skip in line for skip in ["CATEGORIES:", "CONTACT:", "Email:", "Phone:"]):
+            if not TITLE_SKIP_PATTERN.search(line):
                 return line
     
-    # Fallback - use first meaningful text
-    words = content.split()[:10]
+    # Fallback - use first meaningful text (bounded split, stops after 10 words)
+    words = content.split(None, 10)[:10]
     return ' '.join(words) + "..." if len(words) == 10 else ' '.join(words)
 
+def _first_lines(content, count):
+    """Return up to `count` leading lines without splitting the whole content"""
+    lines = []
+    start = 0
+    while len(lines) < count:
+        end = content.find('\n', start)
+        if end == -1:
+            lines.append(content[start:])
+            break
+        lines.append(content[start:end])
+        start = end + 1
+    return lines
+
 def show_document_dashboard(documents):
     """Display the document dashboard"""
     if not documents:
@@ -164,18 +204,11 @@ def show_document_dashboard(documents):
     # Document list
     st.subheader("📋 Document List")
     
-    # Create DataFrame for display
-    display_data = []
-    for i, doc in enumerate(documents):
-        display_data.append({
-            "Title": doc['title'][:50] + "..." if len(doc['title']) > 50 else doc['title'],
-            "Uploaded": doc['created_at'].strftime('%Y-%m-%d %H:%M'),
-            "Chunks": doc['chunks'],
-            "Size": f"{doc['total_length']:,} chars",
-            "Status": "✅ Embedded" if doc['has_embeddings'] else "⏳ Processing"
-        })
-    
-    df = pd.DataFrame(display_data)
+    # Reuse the DataFrame built at load time
+    df = st.session_state.get('document_df')
+    if df is None:
+        df = _build_display_df(documents)
+        st.session_state.document_df = df
     
     # Add selection capability
     selected_indices = st.dataframe(
@@ -191,6 +224,19 @@ def show_document_dashboard(documents):
         selected_idx = selected_indices.selection.rows[0]
         show_document_details(documents[selected_idx])
 
+def _build_display_df(documents):
+    """Build the document list DataFrame shown in the dashboard"""
+    # Build each column directly instead of one dict per row
+    return pd.DataFrame({
+        "Title": [d['title'][:50] + "..." if len(d['title']) > 50 else d['title'] for d in documents],
+        # Formatted per row: TIMESTAMPTZ values carry the session's UTC offset, which
+        # differs across a DST change and makes pd.to_datetime reject the column
+        "Uploaded": [d['created_at'].strftime('%Y-%m-%d %H:%M') for d in documents],
+        "Chunks": [d['chunks'] for d in documents],
+        "Size": [f"{d['total_length']:,} chars" for d in documents],
+        "Status": ["✅ Embedded" if d['has_embeddings'] else "⏳ Processing" for d in documents]
+    })
+
 def show_document_details(document):
     """Show detailed view of a selected document"""
     st.subheader("🔍 Document Details")
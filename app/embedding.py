@@ -1,9 +1,36 @@
 import ollama
 import streamlit as st
+import asyncio
+import bisect
+import hashlib
+import sqlite3
+import threading
+import time
 import uuid
 import os
 import numpy as np
 
+# Word endings that close a sentence when chunking
+SENTENCE_ENDINGS = ('.', '!', '?')
+
+# Embedding width, matching the vector(768) column in init.sql
+EMBEDDING_DIM = int(os.getenv('EMBEDDING_DIM', '768'))
+
+# On-disk embedding cache shared by all sessions and restarts
+EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH', '/tmp/raggy_muffin_embeddings.sqlite3')
+# Most vectors kept on disk; the least recently used are pruned past this
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', '200000'))
+# Bumped whenever the cache table changes; older tables are dropped and rebuilt
+EMBEDDING_CACHE_SCHEMA = 2
+# Keys per SELECT ... IN (...) lookup, below SQLite's bound-parameter limit
+CACHE_LOOKUP_BATCH = 500
+
+# Maximum number of texts sent in one /api/embed request
+EMBED_BATCH_SIZE = int(os.getenv('OLLAMA_EMBED_BATCH_SIZE', '64'))
+
+# Maximum number of in-flight embedding requests to the Ollama server
+EMBED_CONCURRENCY = int(os.getenv('OLLAMA_EMBED_CONCURRENCY', '8'))
+
 @st.cache_resource
 def get_ollama_client():
     """Get Ollama client with configuration"""
@@ -24,74 +51,194 @@ def chunk_text(text, chunk_size=300, overlap_words=50):
     if len(words) <= chunk_size:
         return [text]
     
-    # Try to split on sentence boundaries when possible
-    sentences = text.split('.')
+    # Without at least two sentence ends there is nothing to snap to,
+    # so go straight to fixed word windows
+    if sum(text.count(ending) for ending in SENTENCE_ENDINGS) < 2:
+        step = max(chunk_size - overlap_words, 1)
+        return [" ".join(words[i:i + chunk_size]) for i in range(0, len(words), step)]
+    
+    # Word offsets just past each sentence end - the text is tokenized only once
+    boundaries = [i + 1 for i, word in enumerate(words) if word.endswith(SENTENCE_ENDINGS)]
+    
+    # Sliding window over the words, snapped back to the last sentence end
+    # that still leaves the chunk at least half full
+    min_fill = max(chunk_size // 2, overlap_words)
     chunks = []
-    current_chunk = ""
-    current_word_count = 0
-    
-    for sentence in sentences:
-        sentence = sentence.strip()
-        if not sentence:
-            continue
-            
-        sentence_words = len(sentence.split())
+    start = 0
+    while start < len(words):
+        end = start + chunk_size
+        if end >= len(words):
+            chunks.append(" ".join(words[start:]))
+            break
+        
+        idx = bisect.bisect_right(boundaries, end) - 1
+        if idx >= 0 and boundaries[idx] > start + min_fill:
+            end = boundaries[idx]
         
-        # If adding this sentence would exceed chunk size, finalize current chunk
-        if current_word_count + sentence_words > chunk_size and current_chunk:
-            chunks.append(current_chunk.strip())
-            # Start new chunk with overlap from previous chunk
-            if overlap_words > 0 and len(chunks) > 0:
-                prev_words = chunks[-1].split()
-                overlap_text = " ".join(prev_words[-overlap_words:]) if len(prev_words) > overlap_words else chunks[-1]
-                current_chunk = overlap_text + ". " + sentence + "."
-                current_word_count = len(current_chunk.split())
-            else:
-                current_chunk = sentence + "."
-                current_word_count = sentence_words
-        else:
-            # Add sentence to current chunk
-            if current_chunk:
-                current_chunk += ". " + sentence + "."
-            else:
-                current_chunk = sentence + "."
-            current_word_count += sentence_words
-    
-    # Add final chunk
-    if current_chunk.strip():
-        chunks.append(current_chunk.strip())
-    
-    # Fallback to word-based chunking if sentence-based didn't work well
-    if not chunks or any(len(chunk.split()) > chunk_size * 1.5 for chunk in chunks):
-        return [" ".join(words[i:i+chunk_size]) for i in range(0, len(words), chunk_size - overlap_words)]
+        chunks.append(" ".join(words[start:end]))
+        # Start the next chunk with overlap from this one
+        start = max(end - overlap_words, start + 1)
     
     return chunks
 
-@st.cache_data(ttl=3600)
-def cached_embed_text(text_list):
-    """Cache embeddings for repeated text processing"""
+def _embed_batched(text_list, host, model):
+    """Embed texts through Ollama's batch endpoint, EMBED_BATCH_SIZE inputs per request"""
+    client = ollama.Client(host=host)
+    
+    # Send texts of similar length together so each batch wastes less padding,
+    # then put the vectors back in input order
+    order = sorted(range(len(text_list)), key=lambda i: len(text_list[i]))
+    vectors = [None] * len(text_list)
+    for start in range(0, len(order), EMBED_BATCH_SIZE):
+        batch = order[start:start + EMBED_BATCH_SIZE]
+        response = client.embed(model=model, input=[text_list[i] for i in batch])
+        for i, vector in zip(batch, response['embeddings']):
+            vectors[i] = vector
+    return vectors
+
+async def _embed_all(text_list, host, model):
+    """Embed texts concurrently, bounded by EMBED_CONCURRENCY"""
+    client = ollama.AsyncClient(host=host)
+    semaphore = asyncio.Semaphore(EMBED_CONCURRENCY)
+    
+    async def embed_one(text):
+        async with semaphore:
+            return await client.embeddings(model=model, prompt=text)
+    
+    return await asyncio.gather(*(embed_one(text) for text in text_list))
+
+def _embed_texts(text_list, model):
+    """Embed texts with Ollama and return L2-normalized float32 rows"""
     host = get_ollama_client()
-    model = get_embedding_model()
     
-    embeddings = []
-    for text in text_list:
-        response = ollama.embeddings(
-            model=model,
-            prompt=text,
-            options={'host': host}
-        )
-        embeddings.append(np.array(response['embedding']))
+    try:
+        vectors = _embed_batched(text_list, host, model)
+    except (AttributeError, ollama.ResponseError):
+        # Client or server predates /api/embed - overlap single-text requests instead
+        responses = asyncio.run(_embed_all(text_list, host, model))
+        vectors = [response['embedding'] for response in responses]
     
-    # Normalize embeddings
-    embeddings = np.array(embeddings)
+    # Convert straight into one float32 matrix
+    embeddings = np.asarray(vectors, dtype=np.float32)
+    
+    # Normalize embeddings in place
     norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
-    normalized_embeddings = embeddings / norms
+    np.divide(embeddings, norms, out=embeddings, where=norms > 1e-12)
     
-    return normalized_embeddings
+    return embeddings
+
+def _cache_key(text, model):
+    """Content hash identifying a text's embedding under a given model"""
+    return hashlib.sha256((model + '\x00' + text).encode('utf-8')).hexdigest()
+
+@st.cache_resource
+def get_embedding_cache():
+    """
+    Connection to the on-disk embedding cache, with the lock serializing its use.
+    Opened once per process; the schema is created (or rebuilt) here only.
+    """
+    conn = sqlite3.connect(EMBEDDING_CACHE_PATH, timeout=30, check_same_thread=False)
+    with conn:
+        if conn.execute("PRAGMA user_version").fetchone()[0] != EMBEDDING_CACHE_SCHEMA:
+            conn.execute("DROP TABLE IF EXISTS embedding_cache")
+            conn.execute(f"PRAGMA user_version = {EMBEDDING_CACHE_SCHEMA}")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS embedding_cache "
+            "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL, expires_at REAL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_used ON embedding_cache(last_used)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_embedding_cache_expires_at ON embedding_cache(expires_at)")
+    return conn, threading.Lock()
+
+def _load_cached_vectors(keys):
+    """Return {key: vector} for the unexpired keys present in the disk cache, marking them used"""
+    found = {}
+    now = time.time()
+    try:
+        conn, lock = get_embedding_cache()
+        with lock, conn:
+            for i in range(0, len(keys), CACHE_LOOKUP_BATCH):
+                batch = keys[i:i + CACHE_LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embedding_cache WHERE key IN ({placeholders}) "
+                    "AND (expires_at IS NULL OR expires_at > ?)",
+                    [*batch, now]
+                )
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+            if found:
+                conn.executemany(
+                    "UPDATE embedding_cache SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+    except sqlite3.Error as e:
+        print(f"Error reading embedding cache: {str(e)}")
+    return found
+
+def _store_cached_vectors(vectors_by_key, ttl=None):
+    """
+    Write {key: vector} into the disk cache, expiring after ttl seconds (never if None),
+    then prune expired entries and trim it to EMBEDDING_CACHE_MAX_ENTRIES
+    """
+    now = time.time()
+    expires_at = now + ttl if ttl else None
+    try:
+        conn, lock = get_embedding_cache()
+        with lock, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embedding_cache (key, vector, last_used, expires_at) VALUES (?, ?, ?, ?)",
+                [(key, vector.tobytes(), now, expires_at) for key, vector in vectors_by_key.items()]
+            )
+            conn.execute("DELETE FROM embedding_cache WHERE expires_at <= ?", (now,))
+            # Least recently used first out; walks the last_used index
+            conn.execute(
+                "DELETE FROM embedding_cache WHERE key IN "
+                "(SELECT key FROM embedding_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (EMBEDDING_CACHE_MAX_ENTRIES,)
+            )
+    except sqlite3.Error as e:
+        print(f"Error writing embedding cache: {str(e)}")
+
+def cached_embed_text(text_list, ttl=None):
+    """
+    Embed texts, reusing vectors persisted in the on-disk cache.
+    Entries are keyed by a hash of model + text, so they survive restarts
+    and hit regardless of list order. Newly embedded texts expire after
+    ttl seconds, or are kept until pruned when ttl is None.
+    """
+    if not text_list:
+        return np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+    
+    model = get_embedding_model()
+    keys = [_cache_key(text, model) for text in text_list]
+    vectors = _load_cached_vectors(keys)
+    
+    # Embed each distinct missing text once
+    missing = {}
+    for key, text in zip(keys, text_list):
+        if key not in vectors:
+            missing.setdefault(key, text)
+    
+    if missing:
+        fresh = _embed_texts(list(missing.values()), model)
+        fresh_by_key = dict(zip(missing.keys(), fresh))
+        _store_cached_vectors(fresh_by_key, ttl)
+        vectors.update(fresh_by_key)
+    
+    return np.stack([vectors[key] for key in keys])
 
 def embed_chunks(chunks, tenant_id):
+    """
+    Embed chunks for a tenant.
+    Returns (ids, tenant_ids, chunks, embeddings) as parallel columns, with
+    embeddings kept as one (n, dim) float32 matrix rather than per-row lists.
+    """
+    # Whitespace-only chunks carry nothing to search for
+    chunks = [chunk for chunk in chunks if chunk.strip()]
     embeddings = cached_embed_text(chunks)
-    return [
-        (str(uuid.uuid4()), tenant_id, chunk, emb.tolist())
-        for chunk, emb in zip(chunks, embeddings)
-    ]
\ No newline at end of file
+    
+    # One urandom call for all ids instead of one per uuid4()
+    raw = os.urandom(16 * len(chunks))
+    ids = [str(uuid.UUID(bytes=raw[i:i + 16], version=4)) for i in range(0, len(raw), 16)]
+    return ids, [tenant_id] * len(chunks), chunks, embeddings
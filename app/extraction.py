@@ -1,50 +1,99 @@
 import spacy
 import re
-from fuzzywuzzy import process
+from itertools import chain
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 import os
 from categories import category_manager, normalize_categories
 
-# Load spaCy model - download with: python -m spacy download en_core_web_sm
-try:
-    nlp = spacy.load("en_core_web_sm")
-except OSError:
-    # If model not found, download it
-    import subprocess
-    subprocess.run(["python", "-m", "spacy", "download", "en_core_web_sm"])
-    nlp = spacy.load("en_core_web_sm")
+# Only NER (doc.ents) and the parser (doc.sents) are used, so skip the rest
+UNUSED_PIPES = ["tagger", "attribute_ruler", "lemmatizer"]
+
+def _load_nlp():
+    """Load spaCy model - download with: python -m spacy download en_core_web_sm"""
+    try:
+        return spacy.load("en_core_web_sm", disable=UNUSED_PIPES)
+    except OSError:
+        # If model not found, download it
+        import subprocess
+        subprocess.run(["python", "-m", "spacy", "download", "en_core_web_sm"])
+        return spacy.load("en_core_web_sm", disable=UNUSED_PIPES)
+
+# One pipeline for the whole process, loaded (and downloaded if needed) at import.
+# Streamlit runs each rerun on a new thread, so per-thread copies would reload it
+# every time; inference on a shared Language is safe.
+nlp = _load_nlp()
 
 # Regular expressions for contact information
-EMAIL_PATTERN = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
+EMAIL_PATTERN = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b'
 PHONE_PATTERN = r'\b(\(\d{3}\)\s*|\d{3}[-.])\d{3}[-.]?\d{4}\b|\b\d{3}[-.]?\d{3}[-.]?\d{4}\b'
 URL_PATTERN = r'https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+'
 ADDRESS_PATTERN = r'\b\d+\s+[A-Za-z0-9\s,.-]+\b(?:avenue|ave|street|st|road|rd|boulevard|blvd|drive|dr|lane|ln|court|ct|way|parkway|pkwy|place|pl)\b'
 
-def extract_structured_data(text):
+# Compiled once at import. Emails, phones and URLs don't overlap, so they are
+# collected in a single scan; addresses are matched separately against the doc.
+CONTACT_RE = re.compile(
+    f"(?P<emails>{EMAIL_PATTERN})|(?P<phones>{PHONE_PATTERN})|(?P<urls>{URL_PATTERN})",
+    re.IGNORECASE
+)
+ADDRESS_RE = re.compile(ADDRESS_PATTERN, re.IGNORECASE)
+
+# Line patterns that capture an organization name, tried in order
+ORG_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE) for pattern in [
+        r'^([A-Z][A-Za-z\s&,.-]+(?:Inc\.?|LLC|Corp\.?|Foundation|Center|Agency|Services|Association|Organization|Department))',
+        r'^([A-Z][A-Za-z\s&,.-]{5,50})\s*$',  # Title case lines (likely org names)
+        r'Organization[:\s]+([A-Za-z\s&,.-]+)',
+        r'Provider[:\s]+([A-Za-z\s&,.-]+)',
+        r'Agency[:\s]+([A-Za-z\s&,.-]+)',
+        r'Department[:\s]+([A-Za-z\s&,.-]+)'
+    ]
+]
+
+# ORG entities containing any of these are contact labels, not provider names
+ORG_FALSE_POSITIVE_RE = re.compile(r'email|phone|website|address|contact|information', re.IGNORECASE)
+
+# Lines containing any of these look like categories or contact info, not titles
+TITLE_SKIP_RE = re.compile(r'email|phone|address|website|http|@|contact|categories', re.IGNORECASE)
+
+# Sentences mentioning any of these words are treated as service descriptions
+SERVICE_RE = re.compile(r'\b(?:provide|offer|service|assist|help|support|available|resource)', re.IGNORECASE)
+
+def extract_structured_data(text, doc=None):
     """
     Extract structured data from text including:
     - Provider name
     - Aid categories
     - Contact information
     - Service description
+    
+    Pass an already parsed spaCy `doc` for `text` to skip re-parsing it.
     """
     # Process with spaCy
-    doc = nlp(text)
+    if doc is None:
+        doc = nlp(text)
+    
+    # Partition the named entities in a single pass
+    org_entities = []
+    location_entities = []
+    for ent in doc.ents:
+        label = ent.label_
+        if label == "ORG":
+            org_entities.append(ent.text)
+        elif label in ("GPE", "LOC"):
+            location_entities.append(ent.text)
     
     # Extract provider name
-    provider_name = extract_provider_name(text, doc)
+    provider_name = extract_provider_name(text, org_entities)
     
     # Extract categories
     categories = extract_categories(text)
     
-    # Extract contact information
-    contacts = {
-        "emails": re.findall(EMAIL_PATTERN, text, re.IGNORECASE),
-        "phones": re.findall(PHONE_PATTERN, text),
-        "urls": re.findall(URL_PATTERN, text),
-        "addresses": extract_addresses(doc)
-    }
+    # Extract contact information in one pass over the text
+    contacts = {"emails": [], "phones": [], "urls": []}
+    for match in CONTACT_RE.finditer(text):
+        contacts[match.lastgroup].append(match.group())
+    contacts["addresses"] = extract_addresses(text, location_entities)
     
     # Extract service description
     description = extract_service_description(text, doc)
@@ -56,14 +105,20 @@ def extract_structured_data(text):
         "description": description
     }
 
-def extract_provider_name(text, doc):
+def extract_structured_data_batch(texts, batch_size=32, n_process=1):
+    """
+    Extract structured data from a list of texts, parsing them in batches
+    with nlp.pipe. Yields one result per text, in order.
+    Set n_process > 1 (or -1 for all cores) to parse in worker processes.
+    """
+    docs = nlp.pipe(texts, batch_size=batch_size, n_process=n_process)
+    for text, doc in zip(texts, docs):
+        yield extract_structured_data(text, doc)
+
+def extract_provider_name(text, org_entities):
     """Extract provider/organization name using spaCy NER and patterns"""
-    # First try spaCy's named entity recognition for organizations
-    org_entities = [ent.text for ent in doc.ents if ent.label_ in ["ORG"]]
-    
-    # Filter out common false positives
-    false_positives = ["email", "phone", "website", "address", "contact", "information"]
-    org_entities = [org for org in org_entities if not any(fp in org.lower() for fp in false_positives)]
+    # First try spaCy's ORG entities, filtering out common false positives
+    org_entities = [org for org in org_entities if not ORG_FALSE_POSITIVE_RE.search(org)]
     
     if org_entities:
         # Return the longest organization name (likely most complete)
@@ -79,17 +134,8 @@ def extract_provider_name(text, doc):
             continue
             
         # Look for organization indicators
-        org_patterns = [
-            r'^([A-Z][A-Za-z\s&,.-]+(?:Inc\.?|LLC|Corp\.?|Foundation|Center|Agency|Services|Association|Organization|Department))',
-            r'^([A-Z][A-Za-z\s&,.-]{5,50})\s*$',  # Title case lines (likely org names)
-            r'Organization[:\s]+([A-Za-z\s&,.-]+)',
-            r'Provider[:\s]+([A-Za-z\s&,.-]+)',
-            r'Agency[:\s]+([A-Za-z\s&,.-]+)',
-            r'Department[:\s]+([A-Za-z\s&,.-]+)'
-        ]
-        
-        for pattern in org_patterns:
-            match = re.search(pattern, line, re.IGNORECASE)
+        for pattern in ORG_PATTERNS:
+            match = pattern.search(line)
             if match:
                 name = match.group(1).strip()
                 if len(name) > 3 and len(name) < 100:  # Reasonable length
@@ -100,8 +146,7 @@ def extract_provider_name(text, doc):
         line = line.strip()
         if line and len(line) > 10 and len(line) < 80:
             # Skip lines that look like categories or contact info
-            skip_patterns = ['email', 'phone', 'address', 'website', 'http', '@', 'contact', 'categories']
-            if not any(skip in line.lower() for skip in skip_patterns):
+            if not TITLE_SKIP_RE.search(line):
                 # Check if it's mostly title case (likely an organization name)
                 words = line.split()
                 if len(words) >= 2 and sum(1 for w in words if w[0].isupper()) >= len(words) * 0.6:
@@ -129,15 +174,20 @@ def extract_categories(text):
             potential_category_terms.append(word)
     
     # Bigrams (pairs of words)
-    for i in range(len(words) - 1):
-        if len(words[i]) > 2 and len(words[i+1]) > 2:  # Avoid very short words
-            bigram = words[i] + " " + words[i+1]
-            potential_category_terms.append(bigram)
+    for first, second in zip(words, words[1:]):
+        if len(first) > 2 and len(second) > 2:  # Avoid very short words
+            potential_category_terms.append(first + " " + second)
+    
+    # Score each distinct term once; repeated terms reuse the result
+    term_categories = {
+        term: category_manager.normalize_category(term, threshold=0.65)[0]
+        for term in set(potential_category_terms)
+    }
     
     # Try to match each potential term
     for term in potential_category_terms:
         # Get the category for this term
-        norm_category, confidence = category_manager.normalize_category(term, threshold=0.65)
+        norm_category = term_categories[term]
         
         if norm_category:
             if norm_category in found_categories:
@@ -147,33 +197,25 @@ def extract_categories(text):
     
     return found_categories
 
-def extract_addresses(doc):
-    """Extract addresses using spaCy's NER"""
-    addresses = []
-    
-    # Look for GPE (Geo-Political Entity) and LOC (Location) entities
-    address_entities = [ent.text for ent in doc.ents if ent.label_ in ["GPE", "LOC"]]
-    
+def extract_addresses(text, location_entities):
+    """Extract addresses using spaCy's NER (GPE and LOC entity texts) and patterns"""
     # Use regex to find address patterns
-    address_matches = re.findall(ADDRESS_PATTERN, doc.text, re.IGNORECASE)
+    address_matches = (match.group() for match in ADDRESS_RE.finditer(text))
     
-    # Combine both approaches
-    addresses = list(set(address_entities + address_matches))
+    # Combine both approaches, dropping case-insensitive duplicates but
+    # keeping the first spelling seen
+    addresses = {}
+    for address in chain(location_entities, address_matches):
+        addresses.setdefault(address.casefold(), address)
     
-    return addresses
+    return list(addresses.values())
 
 def extract_service_description(text, doc):
     """Extract service description using key sentences"""
     sentences = [sent.text.strip() for sent in doc.sents]
     
     # Look for sentences that mention services or assistance
-    service_keywords = ["provide", "offer", "service", "assist", "help", "support", "available", "resource"]
-    
-    service_sentences = []
-    for sentence in sentences:
-        sentence_lower = sentence.lower()
-        if any(keyword in sentence_lower for keyword in service_keywords):
-            service_sentences.append(sentence)
+    service_sentences = [sentence for sentence in sentences if SERVICE_RE.search(sentence)]
     
     # If we found specific service sentences, use those
     if service_sentences:
@@ -1,36 +1,213 @@
 import ollama
+import asyncio
 import json
 import re
 import os
-from categories import category_manager, normalize_categories
+import threading
+
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+from categories import category_manager
+
+# Keep the extraction model (and its prompt-prefix KV cache) loaded between documents
+EXTRACTION_KEEP_ALIVE = os.getenv('OLLAMA_KEEP_ALIVE', '30m')
+# Max in-flight extraction requests; match the server's OLLAMA_NUM_PARALLEL
+EXTRACTION_CONCURRENCY = int(os.getenv('OLLAMA_EXTRACTION_CONCURRENCY', '4'))
+# Upper bound on generated tokens; extraction JSON is typically 150-300 tokens
+EXTRACTION_MAX_TOKENS = 350
+# Characters of document content sent to the model per extraction
+EXTRACTION_INPUT_CHARS = 1500
+HORIZONTAL_SPACE_RE = re.compile(r'[ \t\r\f\v]+')
+LINE_BREAK_RE = re.compile(r' ?\n\s*')
+
+# Inputs that skip the LLM when regex extraction already finds contacts and categories
+FAST_PATH_MAX_CHARS = 500
+# Tabular input qualifies at a larger size, but only as a single record: a sheet of
+# several providers must not collapse into one regex result
+FAST_PATH_FILE_TYPES = ('csv', 'excel')
+FAST_PATH_TABULAR_MAX_CHARS = FAST_PATH_MAX_CHARS * 4
+
+# JSON schema for Ollama structured outputs; constrains decoding to the shape the prompt asks for
+EXTRACTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "provider_name": {"type": "string"},
+        "categories": {"type": "array", "items": {"type": "string"}},
+        "contacts": {
+            "type": "object",
+            "properties": {
+                "emails": {"type": "array", "items": {"type": "string"}},
+                "phones": {"type": "array", "items": {"type": "string"}},
+                "websites": {"type": "array", "items": {"type": "string"}},
+                "addresses": {"type": "array", "items": {"type": "string"}}
+            },
+            "required": ["emails", "phones", "websites", "addresses"]
+        },
+        "description": {"type": "string"}
+    },
+    "required": ["provider_name", "categories", "contacts", "description"]
+}
+
+# Fallback extraction patterns, compiled once
+EMAIL_RE = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b')
+PHONE_RE = re.compile(r'\b(\(\d{3}\)\s*|\d{3}[-.])\d{3}[-.]?\d{4}\b|\b\d{3}[-.]?\d{3}[-.]?\d{4}\b')
+URL_RE = re.compile(r'https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+')
+PROVIDER_PATTERNS = [
+    re.compile(r'([A-Z][A-Za-z\s&]+(?:Inc\.|LLC|Corporation|Corp\.|Company|Co\.|Foundation|Organization|Org\.|Agency|Services|Center|Centre))', re.MULTILINE),
+    re.compile(r'^([A-Z][A-Za-z\s&]+)(?=\n|\r)', re.MULTILINE),  # First line that starts with capital
+]
+
+# Keyword -> category for the fallback category scan
+CATEGORY_KEYWORDS = {
+    "Food Assistance": ["food", "meal", "nutrition", "pantry", "kitchen"],
+    "Housing": ["housing", "shelter", "rent", "homeless"],
+    "Medical": ["health", "medical", "clinic", "doctor", "hospital"],
+    "Financial": ["financial", "money", "cash", "assistance", "benefit"],
+    "Education": ["education", "school", "training", "tutor", "learning"],
+    "Legal": ["legal", "law", "attorney", "court", "justice"],
+    "Employment": ["job", "employment", "career", "work", "hiring"]
+}
+KEYWORD_CATEGORIES = {keyword: category for category, keywords in CATEGORY_KEYWORDS.items() for keyword in keywords}
+# Substring match like `keyword in text.lower()`; the lookahead lets overlapping hits all report
+CATEGORY_KEYWORD_RE = re.compile(
+    "(?=(" + "|".join(sorted(map(re.escape, KEYWORD_CATEGORIES), key=len, reverse=True)) + "))",
+    re.IGNORECASE | re.ASCII
+)
+# Whole-word keyword hits only ("work" but not "network"), for deciding the fast path
+CATEGORY_WORD_RE = re.compile(
+    r"\b(?:" + "|".join(map(re.escape, KEYWORD_CATEGORIES)) + r")\b",
+    re.IGNORECASE | re.ASCII
+)
+
+class JSONObjectScanner:
+    """Incrementally track brace depth of a JSON object, respecting string literals"""
+    
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+    
+    def feed(self, chunk):
+        """Return the offset just past the closing brace of the first object, or -1"""
+        for i, char in enumerate(chunk):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                # Quotes only open a string once inside the object
+                self.in_string = self.depth > 0
+            elif char == '{':
+                self.depth += 1
+            elif char == '}' and self.depth > 0:
+                self.depth -= 1
+                if self.depth == 0:
+                    return i + 1
+        return -1
+
+def _extract_json(text):
+    """First balanced JSON object in text via a linear brace scan, or None"""
+    start = text.find('{')
+    if start < 0:
+        return None
+    end = JSONObjectScanner().feed(text[start:])
+    return text[start:start + end] if end >= 0 else None
+
+def _first_unique(values, limit):
+    """First `limit` distinct values in order, without consuming the rest"""
+    seen = {}
+    for value in values:
+        seen.setdefault(value, None)
+        if len(seen) >= limit:
+            break
+    return list(seen)
+
+def _collapse_line_break(match):
+    """Keep paragraph breaks but drop blank-line runs and indentation"""
+    return '\n\n' if match.group().count('\n') > 1 else '\n'
 
 class LLMDataExtractor:
     def __init__(self):
         """Initialize the LLM-based data extractor using Ollama"""
-        self.model = os.getenv('OLLAMA_CHAT_MODEL', 'llama3.2:3b-instruct-q4_0')
+        # Extraction can run on its own (smaller, quantized) tag; defaults to the chat model
+        self.model = os.getenv('OLLAMA_EXTRACTION_MODEL', os.getenv('OLLAMA_CHAT_MODEL', 'llama3.2:3b-instruct-q4_0'))
         self.host = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
         print(f"Using Ollama model: {self.model}")
+        
+        # Client and generation settings are built once and reused for every request
+        self.client = ollama.Client(host=self.host)
+        self._chat_kwargs = {
+            'model': self.model,
+            'format': EXTRACTION_SCHEMA,
+            'options': {'temperature': 0.3, 'num_predict': EXTRACTION_MAX_TOKENS},
+            'keep_alive': EXTRACTION_KEEP_ALIVE,
+            'stream': True
+        }
+        
+        # Category keys are fixed once category_manager is built, so the static
+        # part of the prompt is formatted once here
+        categories_str = ", ".join(category_manager.get_all_categories()[:10])  # Limit for token count
+        
+        # Everything before the document is identical across calls, so Ollama can
+        # reuse the KV cache for that prefix and only evaluate the document tokens
+        self._prompt_prefix = f"""Extract structured information from the document below and return it as valid JSON.
+
+EXTRACTION REQUIREMENTS:
+1. PROVIDER NAME: Extract the organization/provider name (company, nonprofit, agency, etc.)
+2. CATEGORIES: Identify aid/service categories from this list: {categories_str}
+3. CONTACTS: Find all emails, phone numbers, websites, and addresses  
+4. DESCRIPTION: Write a concise summary of the main services or assistance offered
+
+Return your response as a valid JSON object with this exact structure:
+{{
+    "provider_name": "Name of the organization or provider",
+    "categories": ["category1", "category2"],
+    "contacts": {{
+        "emails": ["email1@example.com"],
+        "phones": ["123-456-7890"],
+        "websites": ["https://example.com"],
+        "addresses": ["Full address"]
+    }},
+    "description": "Brief description of services"
+}}
+
+IMPORTANT: Return ONLY the JSON object, no additional text.
+
+"""
     
     def extract_structured_data(self, text, file_type="text"):
         """
         Extract structured data using LLM prompting
         Returns same format as original extraction.py for compatibility
         """
-        # Create extraction prompt based on file type
-        prompt = self._create_extraction_prompt(text, file_type)
+        fast_result = self._fast_path_extraction(text, file_type)
+        if fast_result is not None:
+            return fast_result
         
         # Generate extraction using LLM
         try:
-            response = ollama.chat(
-                model=self.model,
-                messages=[
-                    {'role': 'system', 'content': 'You are an expert data extraction assistant. Extract structured information from documents and return valid JSON.'},
-                    {'role': 'user', 'content': prompt}
-                ],
-                options={'host': self.host, 'temperature': 0.3}
-            )
+            stream = self.client.chat(messages=self._build_messages(text, file_type), **self._chat_kwargs)
             
-            extracted_text = response['message']['content']
+            # Stop reading (which cancels generation) once the JSON object closes
+            scanner = JSONObjectScanner()
+            parts = []
+            try:
+                for chunk in stream:
+                    content = chunk['message']['content']
+                    end = scanner.feed(content)
+                    if end >= 0:
+                        parts.append(content[:end])
+                        break
+                    parts.append(content)
+            finally:
+                stream.close()
+            extracted_text = ''.join(parts)
             
             # Parse the LLM response into structured format
             parsed_data = self._parse_llm_response(extracted_text, text)
@@ -42,83 +219,160 @@ class LLMDataExtractor:
         
         return parsed_data
     
-    def _create_extraction_prompt(self, text, file_type):
-        """Create a detailed extraction prompt"""
+    def extract_structured_data_batch(self, texts, file_type="text"):
+        """Extract structured data for several documents, returned in input order"""
+        return self.extract_many([(text, file_type) for text in texts])
+    
+    def extract_many(self, items):
+        """Extract (text, file_type) pairs concurrently, returned in input order"""
+        if not items:
+            return []
+        return asyncio.run(self._extract_all(items))
+    
+    async def _extract_all(self, items):
+        """Send extraction requests concurrently so the server can batch them"""
+        client = ollama.AsyncClient(host=self.host)
+        semaphore = asyncio.Semaphore(EXTRACTION_CONCURRENCY)
         
-        # Get available categories for the prompt
-        available_categories = category_manager.get_all_categories()
-        categories_str = ", ".join(available_categories[:10])  # Limit for token count
+        async def extract_one(text, file_type):
+            async with semaphore:
+                return await self.extract_structured_data_async(text, file_type, client)
         
-        prompt = f"""Extract structured information from this {file_type} document and return it as valid JSON.
-
-EXTRACTION REQUIREMENTS:
-1. PROVIDER NAME: Extract the organization/provider name (company, nonprofit, agency, etc.)
-2. CATEGORIES: Identify aid/service categories from this list: {categories_str}
-3. CONTACTS: Find all emails, phone numbers, websites, and addresses  
-4. DESCRIPTION: Write a concise summary of the main services or assistance offered
+        results = await asyncio.gather(*(extract_one(text, file_type) for text, file_type in items), return_exceptions=True)
+        # One bad document must not sink the batch
+        return [
+            self._fallback_extraction(text) if isinstance(result, Exception) else result
+            for (text, _), result in zip(items, results)
+        ]
+    
+    async def extract_structured_data_async(self, text, file_type="text", client=None):
+        """Async counterpart of extract_structured_data"""
+        fast_result = self._fast_path_extraction(text, file_type)
+        if fast_result is not None:
+            return fast_result
+        
+        if client is None:
+            client = ollama.AsyncClient(host=self.host)
+        
+        try:
+            stream = await client.chat(messages=self._build_messages(text, file_type), **self._chat_kwargs)
+            
+            scanner = JSONObjectScanner()
+            parts = []
+            try:
+                async for chunk in stream:
+                    content = chunk['message']['content']
+                    end = scanner.feed(content)
+                    if end >= 0:
+                        parts.append(content[:end])
+                        break
+                    parts.append(content)
+            finally:
+                await stream.aclose()
+            return self._parse_llm_response(''.join(parts), text)
+        except Exception as e:
+            print(f"LLM extraction failed: {e}")
+            return self._fallback_extraction(text)
+    
+    def _fast_path_extraction(self, text, file_type):
+        """Regex result for short input or a single tabular record when it is already confident, else None"""
+        if file_type in FAST_PATH_FILE_TYPES:
+            # dataframe_to_text separates rows with a blank line
+            if len(text) >= FAST_PATH_TABULAR_MAX_CHARS or '\n\n' in text.strip():
+                return None
+        elif len(text) >= FAST_PATH_MAX_CHARS:
+            return None
+        
+        # Substring hits ("rent" in "parent") are too loose to skip the model on
+        if not CATEGORY_WORD_RE.search(text):
+            return None
+        
+        result = self._fallback_extraction(text)
+        has_contact = result['emails'] or result['phones']
+        return result if has_contact else None
+    
+    def _build_messages(self, text, file_type):
+        """Build the chat messages for one document"""
+        return [
+            {'role': 'system', 'content': 'You are an expert data extraction assistant. Extract structured information from documents and return valid JSON.'},
+            {'role': 'user', 'content': self._create_extraction_prompt(text, file_type)}
+        ]
+    
+    def _create_extraction_prompt(self, text, file_type):
+        """Create a detailed extraction prompt"""
+        return f"""{self._prompt_prefix}DOCUMENT TYPE: {file_type}
 
 DOCUMENT CONTENT:
-{text[:1500]}
-
-Return your response as a valid JSON object with this exact structure:
-{{
-    "provider_name": "Name of the organization or provider",
-    "categories": ["category1", "category2"],
-    "contacts": {{
-        "emails": ["email1@example.com"],
-        "phones": ["123-456-7890"],
-        "websites": ["https://example.com"],
-        "addresses": ["Full address"]
-    }},
-    "description": "Brief description of services"
-}}
-
-IMPORTANT: Return ONLY the JSON object, no additional text."""
+{self._document_excerpt(text)}"""
+    
+    def _document_excerpt(self, text):
+        """Whitespace-compacted head of the document, cut at a word boundary"""
+        # Compacting first keeps PDF layout padding from eating the input budget
+        window = text[:EXTRACTION_INPUT_CHARS * 4]
+        compact = LINE_BREAK_RE.sub(_collapse_line_break, HORIZONTAL_SPACE_RE.sub(' ', window)).strip()
+        if len(compact) <= EXTRACTION_INPUT_CHARS:
+            return compact
         
-        return prompt
+        cut = max(compact.rfind(' ', 0, EXTRACTION_INPUT_CHARS + 1), compact.rfind('\n', 0, EXTRACTION_INPUT_CHARS + 1))
+        return compact[:cut if cut > EXTRACTION_INPUT_CHARS // 2 else EXTRACTION_INPUT_CHARS]
     
     def _parse_llm_response(self, response_text, original_text):
         """Parse LLM response into structured format"""
         try:
-            # Try to extract JSON from the response
-            json_match = re.search(r'\{[\s\S]*\}', response_text)
-            if json_match:
-                json_str = json_match.group()
-                data = json.loads(json_str)
-                
-                # Normalize the extracted data
-                provider_name = data.get('provider_name', 'Unknown Provider')
-                
-                # Normalize categories using category manager
-                raw_categories = data.get('categories', [])
-                categories = normalize_categories(raw_categories)
-                
-                # Extract contacts
-                contacts = data.get('contacts', {})
-                emails = contacts.get('emails', [])
-                phones = contacts.get('phones', [])
-                websites = contacts.get('websites', [])
-                addresses = contacts.get('addresses', [])
-                
-                # Get description
-                description = data.get('description', '')
-                
-                # If no description, generate one
-                if not description and categories:
-                    description = f"Provider offering {', '.join(categories)} services"
-                
-                return {
-                    'provider_name': provider_name,
-                    'categories': categories,
-                    'emails': emails,
-                    'phones': phones,
-                    'websites': websites,
-                    'addresses': addresses,
-                    'description': description,
-                    'raw_categories': raw_categories
-                }
-            else:
-                raise ValueError("No JSON found in response")
+            # Schema-constrained responses parse directly; only fall back to locating
+            # the JSON object when the model (or an older server) wrapped it in prose
+            data = None
+            stripped = response_text.strip()
+            if stripped.startswith('{'):
+                try:
+                    data = json_loads(stripped)
+                except ValueError:
+                    pass
+            
+            if data is None:
+                json_str = _extract_json(response_text)
+                if json_str is None:
+                    raise ValueError("No JSON found in response")
+                data = json_loads(json_str)
+            
+            # Normalize the extracted data
+            provider_name = data.get('provider_name', 'Unknown Provider')
+            
+            # Normalize categories using category manager, grouped like extraction.py
+            # as {category: [raw terms]}; normalize_category is memoized per term
+            raw_categories = data.get('categories', [])
+            categories = {}
+            for raw_category in raw_categories:
+                if not isinstance(raw_category, str):
+                    continue
+                normalized, _ = category_manager.normalize_category(raw_category)
+                if normalized:
+                    categories.setdefault(normalized, []).append(raw_category)
+            
+            # Extract contacts
+            contacts = data.get('contacts', {})
+            emails = contacts.get('emails', [])
+            phones = contacts.get('phones', [])
+            websites = contacts.get('websites', [])
+            addresses = contacts.get('addresses', [])
+            
+            # Get description
+            description = data.get('description', '')
+            
+            # If no description, generate one
+            if not description and categories:
+                description = f"Provider offering {', '.join(categories)} services"
+            
+            return {
+                'provider_name': provider_name,
+                'categories': categories,
+                'emails': emails,
+                'phones': phones,
+                'websites': websites,
+                'addresses': addresses,
+                'description': description,
+                'raw_categories': raw_categories
+            }
                 
         except Exception as e:
             print(f"Failed to parse LLM response: {e}")
@@ -127,66 +381,48 @@ IMPORTANT: Return ONLY the JSON object, no additional text."""
     
     def _fallback_extraction(self, text):
         """Fallback extraction method using regex patterns"""
-        # Email pattern
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        emails = re.findall(email_pattern, text)
-        
-        # Phone pattern (various formats)
-        phone_pattern = r'\b(\(\d{3}\)\s*|\d{3}[-.])\d{3}[-.]?\d{4}\b|\b\d{3}[-.]?\d{3}[-.]?\d{4}\b'
-        phones = re.findall(phone_pattern, text)
-        
-        # URL pattern
-        url_pattern = r'https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+'
-        websites = re.findall(url_pattern, text)
+        # Matches are consumed lazily, so scanning stops once enough unique hits are found;
+        # group() keeps the whole phone number rather than just its first capture group
+        emails = _first_unique((match.group() for match in EMAIL_RE.finditer(text)), 3)
+        phones = _first_unique((match.group() for match in PHONE_RE.finditer(text)), 3)
+        websites = _first_unique((match.group() for match in URL_RE.finditer(text)), 2)
         
         # Try to find provider name (look for patterns like "Company Name, Inc." etc.)
-        provider_patterns = [
-            r'([A-Z][A-Za-z\s&]+(?:Inc\.|LLC|Corporation|Corp\.|Company|Co\.|Foundation|Organization|Org\.|Agency|Services|Center|Centre))',
-            r'^([A-Z][A-Za-z\s&]+)(?=\n|\r)',  # First line that starts with capital
-        ]
-        
         provider_name = "Unknown Provider"
-        for pattern in provider_patterns:
-            matches = re.findall(pattern, text[:500], re.MULTILINE)
-            if matches:
-                provider_name = matches[0].strip()
+        head = text[:500]
+        for pattern in PROVIDER_PATTERNS:
+            match = pattern.search(head)
+            if match:
+                provider_name = match.group(1).strip()
                 break
         
-        # Basic category detection
-        categories = []
-        text_lower = text.lower()
-        
-        # Check for category keywords
-        category_keywords = {
-            "Food Assistance": ["food", "meal", "nutrition", "pantry", "kitchen"],
-            "Housing": ["housing", "shelter", "rent", "homeless"],
-            "Medical": ["health", "medical", "clinic", "doctor", "hospital"],
-            "Financial": ["financial", "money", "cash", "assistance", "benefit"],
-            "Education": ["education", "school", "training", "tutor", "learning"],
-            "Legal": ["legal", "law", "attorney", "court", "justice"],
-            "Employment": ["job", "employment", "career", "work", "hiring"]
-        }
-        
-        for category, keywords in category_keywords.items():
-            if any(keyword in text_lower for keyword in keywords):
-                categories.append(category)
+        # Basic category detection: one case-insensitive pass over the text,
+        # grouped like extraction.py as {category: [matched keywords]}
+        categories = {}
+        for match in CATEGORY_KEYWORD_RE.finditer(text):
+            keyword = match.group(1).lower()
+            matched = categories.setdefault(KEYWORD_CATEGORIES[keyword], [])
+            if keyword not in matched:
+                matched.append(keyword)
         
-        # Normalize categories
-        categories = normalize_categories(categories) if categories else ["General Assistance"]
+        if not categories:
+            categories = {"General Assistance": []}
         
         # Generate description
-        first_paragraph = text.split('\n\n')[0][:200]
+        # Slice up to the first blank line instead of splitting the whole document
+        paragraph_end = text.find('\n\n', 0, 201)
+        first_paragraph = text[:paragraph_end if paragraph_end >= 0 else 200]
         description = first_paragraph if first_paragraph else f"Provider offering {', '.join(categories)} services"
         
         return {
             'provider_name': provider_name,
             'categories': categories,
-            'emails': list(set(emails))[:3],  # Limit to 3 unique emails
-            'phones': list(set(phones))[:3],  # Limit to 3 unique phones
-            'websites': list(set(websites))[:2],  # Limit to 2 unique websites
+            'emails': emails,  # Up to 3 unique emails
+            'phones': phones,  # Up to 3 unique phones
+            'websites': websites,  # Up to 2 unique websites
             'addresses': [],  # Address extraction is complex, leaving empty for fallback
             'description': description,
-            'raw_categories': categories
+            'raw_categories': list(categories)
         }
     
     def format_for_embedding(self, extracted_data):
@@ -222,11 +458,31 @@ IMPORTANT: Return ONLY the JSON object, no additional text."""
         
         return "\n\n".join(sections)
 
+# Shared across Streamlit sessions; the lock stops concurrent first calls building two
+_extractor = None
+_extractor_lock = threading.Lock()
+
+def get_llm_extractor():
+    """Return the shared LLMDataExtractor, creating it on first use"""
+    global _extractor
+    if _extractor is None:
+        with _extractor_lock:
+            if _extractor is None:
+                _extractor = LLMDataExtractor()
+    return _extractor
+
 # Standalone function for compatibility with existing code
 def extract_structured_data_llm(text, file_type="text"):
     """
-    Standalone function that creates an LLMDataExtractor instance and extracts data.
+    Standalone function that extracts data with the shared LLMDataExtractor.
     This function maintains compatibility with existing import statements.
     """
-    extractor = LLMDataExtractor()
-    return extractor.extract_structured_data(text, file_type)
\ No newline at end of file
+    return get_llm_extractor().extract_structured_data(text, file_type)
+
+def extract_structured_data_llm_batch(texts, file_type="text"):
+    """Batch counterpart of extract_structured_data_llm"""
+    return get_llm_extractor().extract_structured_data_batch(texts, file_type)
+
+def extract_many_llm(items):
+    """Extract (text, file_type) pairs concurrently with the shared LLMDataExtractor"""
+    return get_llm_extractor().extract_many(items)
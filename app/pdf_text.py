@@ -0,0 +1,54 @@
+"""
+PDF text extraction by page range, kept free of app imports so that
+worker processes only load the PDF libraries
+"""
+import io
+import logging
+
+# PyMuPDF parses PDFs in C; pdfplumber (pure Python on pdfminer.six) is the fallback
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+# pdfminer logs per layout object at DEBUG/INFO; if the app's logging is verbose,
+# formatting those records costs more than the parsing itself
+logging.getLogger("pdfminer").setLevel(logging.WARNING)
+
+def _page_text(page):
+    """A page's text and trailing newline, releasing the page's parsed objects once read"""
+    # Pages with no text layer (e.g. scans) return None
+    text = (page.extract_text() or "") + "\n"
+    page.close()
+    return text
+
+def _open_pymupdf(source):
+    """Open a PDF given as bytes or a file path with PyMuPDF"""
+    if isinstance(source, bytes):
+        return pymupdf.open(stream=source, filetype="pdf")
+    return pymupdf.open(source)
+
+def _open_pdfplumber(source):
+    """Open a PDF given as bytes or a file path with pdfplumber"""
+    # Imported only on this fallback path; pdfminer.six is slow to import
+    import pdfplumber
+    return pdfplumber.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+
+def pdf_page_count(source):
+    """Number of pages in a PDF given as bytes or a file path"""
+    if pymupdf is not None:
+        with _open_pymupdf(source) as doc:
+            return doc.page_count
+    with _open_pdfplumber(source) as pdf:
+        return len(pdf.pages)
+
+def pdf_range_text(source, start, stop):
+    """Text of pages [start, stop) of a PDF given as bytes or a file path"""
+    if pymupdf is not None:
+        # get_text already ends each page's text with a newline
+        with _open_pymupdf(source) as doc:
+            return "".join(doc[i].get_text() for i in range(start, stop))
+
+    # One join instead of repeated += copies; only one page's layout is held at a time
+    with _open_pdfplumber(source) as pdf:
+        return "".join(_page_text(page) for page in pdf.pages[start:stop])
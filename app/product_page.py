@@ -2,6 +2,16 @@ import streamlit as st
 from config import config
 from auth import CognitoAuth
 
+@st.cache_data
+def _starter_features_html():
+    """Starter plan features as <li> items; config is fixed for the process"""
+    return '\n'.join([f'<li>{feature}</li>' for feature in config.get_starter_plan_features()])
+
+@st.cache_data
+def _trial_benefits_html():
+    """First three trial benefits as checkmarked lines"""
+    return '<br>'.join([f"✅ {benefit.replace('✅ ', '')}" for benefit in config.get_trial_benefits()[:3]])
+
 def product_page():
     # Hero Section
     st.markdown(f"""
@@ -33,19 +43,18 @@ def product_page():
         
         st.markdown(f'<p style="text-align: center; color: {config.SECONDARY_COLOR}; margin-top: 0.5rem;">{config.CTA_TRIAL_TEXT}</p>', unsafe_allow_html=True)
     
-    st.markdown("---")
-    
-    # Social Proof
+    # Social Proof and Key Benefits heading, rendered as one markdown element
     st.markdown(f"""
+    ---
+    
     <div style="text-align: center; padding: 1rem 0;">
         <p style="color: #888; font-size: 0.9rem;">
             {config.SOCIAL_PROOF_TEXT}
         </p>
     </div>
-    """, unsafe_allow_html=True)
     
-    # Key Benefits
-    st.markdown(f"## Why Choose {config.APP_NAME}?")
+    ## Why Choose {config.APP_NAME}?
+    """, unsafe_allow_html=True)
     
     col1, col2, col3 = st.columns(3)
     
@@ -73,10 +82,12 @@ def product_page():
         *"{config.FEATURE_3_QUOTE}"*
         """)
     
-    st.markdown("---")
-    
     # How It Works
-    st.markdown("## How It Works")
+    st.markdown("""
+    ---
+    
+    ## How It Works
+    """)
     
     col1, col2, col3, col4 = st.columns(4)
     steps = config.get_how_it_works_steps()
@@ -89,13 +100,15 @@ def product_page():
             {step['details']}
             """)
     
-    st.markdown("---")
-    
     # Pricing Preview
-    st.markdown("## Simple, Transparent Pricing")
+    st.markdown("""
+    ---
+    
+    ## Simple, Transparent Pricing
+    """)
     
     col1, col2, col3 = st.columns([1, 2, 1])
-    features_list = '\n'.join([f'<li>{feature}</li>' for feature in config.get_starter_plan_features()])
+    features_list = _starter_features_html()
     
     with col2:
         st.markdown(f"""
@@ -109,14 +122,16 @@ def product_page():
                 Perfect for individual researchers and small teams
             </p>
         </div>
-        """, unsafe_allow_html=True)
         
-        st.markdown(f'<p style="text-align: center; margin-top: 1rem;"><a href="#" style="color: {config.PRIMARY_COLOR};">View all plans →</a></p>', unsafe_allow_html=True)
-    
-    st.markdown("---")
+        <p style="text-align: center; margin-top: 1rem;"><a href="#" style="color: {config.PRIMARY_COLOR};">View all plans →</a></p>
+        """, unsafe_allow_html=True)
     
     # Success Stories
-    st.markdown("## What Our Users Say")
+    st.markdown("""
+    ---
+    
+    ## What Our Users Say
+    """)
     
     col1, col2 = st.columns(2)
     
@@ -134,14 +149,15 @@ def product_page():
         **{config.TESTIMONIAL_2_AUTHOR}** - {config.TESTIMONIAL_2_TITLE}
         """)
     
-    st.markdown("---")
-    
     # Final CTA
-    st.markdown("## Ready to Transform Your Research?")
+    st.markdown("""
+    ---
+    
+    ## Ready to Transform Your Research?
+    """)
     
     col1, col2, col3 = st.columns([1, 1, 1])
-    trial_benefits = config.get_trial_benefits()
-    benefits_text = '<br>'.join([f"✅ {benefit.replace('✅ ', '')}" for benefit in trial_benefits[:3]])
+    benefits_text = _trial_benefits_html()
     
     with col2:
         auth = CognitoAuth()
@@ -1,11 +1,82 @@
-from embedding import cached_embed_text
+from embedding import cached_embed_text, get_embedding_model
 from db import engine
 from sqlalchemy import text
 import ollama
 from categories import category_manager
+from chunk_fields import FIELDS_VERSION, chunk_headers, parse_chunk_fields
 import streamlit as st
 import re
 import os
+import hashlib
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from functools import lru_cache
+
+# Both nearest-chunk queries order by cosine distance (<=>), which matches the HNSW
+# vector_cosine_ops index from init.sql, so the planner can use it instead of a full
+# scan; stored embeddings are unit-normalized
+
+# Nearest chunks tagged at ingest with any of the given categories
+# (re-sorted outside the scan, which iterative scans may return slightly out of order)
+NEAREST_CATEGORY_CHUNKS_SQL = text("""
+    WITH nearest AS MATERIALIZED (
+        SELECT content, meta_data, embedding <=> (:query_emb)::vector AS distance
+        FROM embeddings
+        WHERE tenant_id = :tenant
+          AND meta_data->'categories' ?| CAST(:categories AS text[])
+        ORDER BY embedding <=> (:query_emb)::vector
+        LIMIT :top_k
+    )
+    SELECT content, meta_data FROM nearest ORDER BY distance
+""")
+# Nearest chunks for several query vectors at once, each with its own limit; rows come
+# back grouped by query in input order, tagged with the query's 1-based position
+NEAREST_CHUNKS_MULTI_SQL = text("""
+    SELECT q.ord, nearest.content, nearest.meta_data
+    FROM UNNEST(CAST(:query_embs AS text[]), CAST(:limits AS int[])) WITH ORDINALITY AS q(emb, lim, ord)
+    CROSS JOIN LATERAL (
+        SELECT content, meta_data, embedding <=> q.emb::vector AS distance
+        FROM embeddings
+        WHERE tenant_id = :tenant
+        ORDER BY embedding <=> q.emb::vector
+        LIMIT q.lim
+    ) AS nearest
+    ORDER BY q.ord, nearest.distance
+""")
+HNSW_EF_SEARCH = int(os.getenv('HNSW_EF_SEARCH', '100'))
+# Transaction-scoped SET LOCAL with a bound value, so the statement text never changes
+SET_EF_SEARCH_SQL = text("SELECT set_config('hnsw.ef_search', :ef_search, true)")
+# Tenant and category filters apply after the HNSW scan, so on their own they can
+# leave fewer than top_k rows (or none) for small tenants. Iterative scans keep
+# walking the graph until the filters are satisfied; they need pgvector >= 0.8 and
+# are skipped on older servers, which keep that limitation. "off" disables them
+HNSW_ITERATIVE_SCAN = os.getenv('HNSW_ITERATIVE_SCAN', 'relaxed_order')
+SET_ITERATIVE_SCAN_SQL = text("SELECT set_config('hnsw.iterative_scan', :iterative_scan, true)")
+PGVECTOR_VERSION_SQL = text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+
+# Headers whose lines are dropped when a chunk is used as a plain description
+HEADER_LINE_RE = re.compile(r'CATEGORIES:|CONTACT INFORMATION:|PROVIDER:')
+
+# How long the Ollama server keeps the chat model loaded between questions
+CHAT_KEEP_ALIVE = os.getenv('OLLAMA_KEEP_ALIVE', '30m')
+
+# Prompt context budget in characters (~4 per token) so the question is never truncated away
+ANSWER_CONTEXT_CHARS = int(os.getenv('ANSWER_CONTEXT_CHARS', '8000'))
+
+# Parsed fields kept for this many distinct chunks
+CHUNK_FIELDS_CACHE_SIZE = 4096
+
+# Seconds a question's embedding stays in the shared on-disk cache; questions
+# aren't kept indefinitely the way document chunks are
+QUERY_EMBEDDING_TTL = int(os.getenv('QUERY_EMBEDDING_CACHE_TTL', '1800'))
+
+# Semantic answer cache: similarity needed to reuse an answer, entry lifetime, and size bounds
+ANSWER_CACHE_THRESHOLD = float(os.getenv('ANSWER_CACHE_THRESHOLD', '0.92'))
+ANSWER_CACHE_TTL = int(os.getenv('ANSWER_CACHE_TTL', str(24 * 3600)))
+ANSWER_CACHE_PER_CONTEXT = 16
+ANSWER_CACHE_MAX_CONTEXTS = 512
 
 def get_chat_model():
     """Get the chat model name from environment"""
@@ -15,43 +86,133 @@ def get_ollama_host():
     """Get Ollama host from environment"""
     return os.getenv('OLLAMA_HOST', 'http://localhost:11434')
 
+@st.cache_resource
+def get_chat_client():
+    """One Ollama client per process, so reruns and sessions share its HTTP connection pool"""
+    return ollama.Client(host=get_ollama_host())
+
+def _warm_up_models():
+    """Load the chat and embedding models on the Ollama server ahead of the first question"""
+    client = get_chat_client()
+    try:
+        # A chat request without messages only loads the model
+        client.chat(model=get_chat_model(), messages=[], keep_alive=CHAT_KEEP_ALIVE)
+        client.embed(model=get_embedding_model(), input=["warmup"], keep_alive=CHAT_KEEP_ALIVE)
+    except Exception as e:
+        print(f"Error warming up Ollama models: {str(e)}")
+
+@st.cache_resource
+def warm_up_models():
+    """Start model warm-up once per process, in the background so the first page render isn't blocked"""
+    thread = threading.Thread(target=_warm_up_models, daemon=True)
+    thread.start()
+    return thread
+
 def detect_category_in_query(query):
     """Detect potential aid categories in the query"""
-    query_lower = query.lower()
-    
-    # Check for direct category mentions
-    categories = []
-    confidences = {}
-    
-    # Split query into words and check each word
+    # Retrieval and answer generation both ask for the same question's categories
+    return list(_detect_categories(query.lower()))
+
+@lru_cache(maxsize=1024)
+def _detect_categories(query_lower):
+    """Categories for a lowercased query, memoized per query string"""
+    # Split query into words, then collect single words and bigrams as candidates
     words = query_lower.split()
+    candidates = [word for word in words if len(word) > 3]  # Skip very short words
+    candidates.extend(
+        f"{words[i]} {words[i+1]}"
+        for i in range(len(words) - 1)
+        if len(words[i]) > 2 and len(words[i+1]) > 2  # Skip very short words
+    )
+    
+    # Score every candidate in one batched call, then keep the best score per category
+    confidences = {}
+    for category, confidence in category_manager.normalize_category_batch(candidates, threshold=0.7):
+        if category and confidence > confidences.get(category, 0):
+            confidences[category] = confidence
     
-    # Check single words
-    for word in words:
-        if len(word) > 3:  # Skip very short words
-            category, confidence = category_manager.normalize_category(word, threshold=0.7)
-            if category and (category not in confidences or confidence > confidences[category]):
-                categories.append(category)
-                confidences[category] = confidence
-    
-    # Check bigrams
-    for i in range(len(words) - 1):
-        if len(words[i]) > 2 and len(words[i+1]) > 2:  # Skip very short words
-            bigram = f"{words[i]} {words[i+1]}"
-            category, confidence = category_manager.normalize_category(bigram, threshold=0.7)
-            if category and (category not in confidences or confidence > confidences[category]):
-                categories.append(category)
-                confidences[category] = confidence
-    
-    # Return unique categories
-    return list(set(categories))
+    # Unique categories, in first-detected order
+    return tuple(confidences)
+
+def _vector_literal(embedding):
+    """pgvector text form of an embedding, for passing vectors inside an array parameter"""
+    return "[" + ",".join(map(str, embedding)) + "]"
 
 @st.cache_data(ttl=1800)
 def cached_embed_query(query):
     """Cache query embeddings for 30 minutes"""
-    embeddings = cached_embed_text([query])
+    embeddings = cached_embed_text([query], ttl=QUERY_EMBEDDING_TTL)
     return embeddings[0].tolist()
 
+@st.cache_data(ttl=1800)
+def cached_embed_queries(queries):
+    """Embed several queries in one batched call, cached for 30 minutes"""
+    # cached_embed_text embeds each distinct text once, so repeated variants are free
+    embeddings = cached_embed_text(list(queries), ttl=QUERY_EMBEDDING_TTL)
+    return [embedding.tolist() for embedding in embeddings]
+
+@st.cache_resource
+def get_chunk_fields_cache():
+    """Process-wide chunk content -> parsed fields, seeded from ingest metadata"""
+    return {"entries": OrderedDict(), "lock": threading.Lock()}
+
+def _chunk_fields(chunk, meta_data=None):
+    """Structured fields of a chunk, from ingest metadata when stored, otherwise parsed once"""
+    cache = get_chunk_fields_cache()
+    with cache["lock"]:
+        fields = cache["entries"].get(chunk)
+        if fields is not None:
+            cache["entries"].move_to_end(chunk)
+            return fields
+    
+    # Rows ingested before the current fields were stored fall back to parsing the text
+    stored = (meta_data or {}).get("fields")
+    if stored and stored.get("version") == FIELDS_VERSION:
+        fields = stored
+    else:
+        fields = parse_chunk_fields(chunk)
+    
+    with cache["lock"]:
+        cache["entries"][chunk] = fields
+        while len(cache["entries"]) > CHUNK_FIELDS_CACHE_SIZE:
+            cache["entries"].popitem(last=False)
+    return fields
+
+def _chunk_contents(result):
+    """Chunk texts from (content, meta_data) rows, keeping their stored fields for answer generation"""
+    chunks = []
+    for content, meta_data in result:
+        _chunk_fields(content, meta_data)
+        chunks.append(content)
+    return chunks
+
+def _nearest_chunks_multi(conn, tenant_id, searches):
+    """Run several (embedding, limit) searches in one round-trip; returns one chunk list per search"""
+    result = conn.execute(
+        NEAREST_CHUNKS_MULTI_SQL,
+        {
+            "tenant": tenant_id,
+            "query_embs": [_vector_literal(embedding) for embedding, _ in searches],
+            "limits": [limit for _, limit in searches]
+        }
+    )
+    chunks_by_search = [[] for _ in searches]
+    for position, content, meta_data in result:
+        _chunk_fields(content, meta_data)
+        chunks_by_search[position - 1].append(content)
+    return chunks_by_search
+
+@st.cache_resource
+def supports_iterative_scan():
+    """Whether the server's pgvector has HNSW iterative scans (0.8 and later)"""
+    # Errors propagate uncached, so a failed check is retried on the next query
+    with engine.connect() as conn:
+        version = conn.execute(PGVECTOR_VERSION_SQL).scalar()
+    if version is None:
+        return False
+    major, minor = (int(part) for part in version.split(".")[:2])
+    return (major, minor) >= (0, 8)
+
 def retrieve_relevant_chunks(query, tenant_id, top_k=4):
     """Retrieve provider information chunks with improved context and category awareness"""
     
@@ -71,82 +232,88 @@ def retrieve_relevant_chunks(query, tenant_id, top_k=4):
         # Create a provider-focused query
         enhanced_query = f"Provider information for {query}"
     
-    # Get embeddings for the enhanced query
-    query_emb = cached_embed_query(enhanced_query)
+    # Every query variant retrieval may need, embedded in one batched call: the
+    # original query is also the question the answer cache embeds afterwards
+    category_queries = [
+        f"Information about {category} services for {original_query}"
+        for category in detected_categories
+    ]
+    query_emb, orig_emb, *cat_embs = cached_embed_queries(
+        (enhanced_query, original_query, *category_queries)
+    )
     
     try:
         with engine.connect() as conn:
-            # First attempt - use the enhanced query with category awareness
-            result = conn.execute(
-                text("""
-                    SELECT content
-                    FROM embeddings
-                    WHERE tenant_id = :tenant
-                    ORDER BY embedding <-> (:query_emb)::vector
-                    LIMIT :top_k
-                """),
-                {"tenant": tenant_id, "query_emb": query_emb, "top_k": top_k}
-            )
+            # Candidate list size trades recall for speed on the HNSW index and tracks
+            # top_k; SET LOCAL keeps it scoped to this transaction so pooled connections
+            # are unaffected
+            conn.execute(SET_EF_SEARCH_SQL, {"ef_search": str(max(HNSW_EF_SEARCH, top_k * 4))})
+            if HNSW_ITERATIVE_SCAN != "off" and supports_iterative_scan():
+                conn.execute(SET_ITERATIVE_SCAN_SQL, {"iterative_scan": HNSW_ITERATIVE_SCAN})
             
-            # Process chunks
-            chunks = [row[0] for row in result]
+            prefiltered = []
+            orig_chunks = None
+            cat_chunks = []
+            if detected_categories:
+                # Pre-filter on categories tagged at ingest; these chunks are normalized
+                # by construction, so no category-expansion queries are needed
+                result = conn.execute(
+                    NEAREST_CATEGORY_CHUNKS_SQL,
+                    {"tenant": tenant_id, "query_emb": query_emb, "top_k": top_k, "categories": detected_categories}
+                )
+                prefiltered = _chunk_contents(result)
             
-            # Check for category headers in the results to identify normalized data
-            has_normalized_data = any("CATEGORIES:" in chunk or "CONTACT INFORMATION:" in chunk for chunk in chunks)
+            # The filters apply after the HNSW scan, so the pre-filter can come back short;
+            # only a full top_k stands in for the unfiltered search
+            if len(prefiltered) >= top_k:
+                chunks = prefiltered
+                has_normalized_data = True
+            else:
+                # First attempt - use the enhanced query with category awareness. The original
+                # query and the category queries (2 nearest chunks each) that may be needed
+                # below ride along in the same round-trip
+                searches = [(query_emb, top_k)]
+                if enhanced_query != original_query:
+                    searches.append((orig_emb, top_k))
+                searches.extend((cat_emb, 2) for cat_emb in cat_embs)
+                chunks, *other_chunks = _nearest_chunks_multi(conn, tenant_id, searches)
+                if enhanced_query != original_query:
+                    orig_chunks, *other_chunks = other_chunks
+                cat_chunks = [chunk for search_chunks in other_chunks for chunk in search_chunks]
+                
+                # Keep the category matches the pre-filter did find, topped up with unfiltered hits
+                if prefiltered:
+                    seen = set(prefiltered)
+                    chunks = prefiltered + [chunk for chunk in chunks if chunk not in seen][:top_k - len(prefiltered)]
+                
+                # Check for category headers in the results to identify normalized data
+                has_normalized_data = any(
+                    not chunk_headers(chunk).isdisjoint(("CATEGORIES:", "CONTACT INFORMATION:"))
+                    for chunk in chunks
+                )
             
-            # If detected categories but didn't get good normalized results, try with category-specific query
+            # If detected categories but didn't get good normalized results, use the category-specific results
             if detected_categories and not has_normalized_data:
-                category_queries = []
-                for category in detected_categories:
-                    category_queries.append(f"Information about {category} services for {original_query}")
-                
-                # Get embeddings for each category query
-                if category_queries:
-                    cat_embs = [cached_embed_query(cq) for cq in category_queries]
-                    cat_chunks = []
-                    
-                    # Query for each category embedding
-                    for cat_emb in cat_embs:
-                        cat_result = conn.execute(
-                            text("""
-                                SELECT content
-                                FROM embeddings
-                                WHERE tenant_id = :tenant
-                                ORDER BY embedding <-> (:query_emb)::vector
-                                LIMIT 2
-                            """),
-                            {"tenant": tenant_id, "query_emb": cat_emb, "top_k": 2}
-                        )
-                        cat_chunks.extend([row[0] for row in cat_result])
+                # If we got meaningful results, combine with original
+                if cat_chunks:
+                    # Deduplicate with set lookups rather than list scans over long strings
+                    seen = set(chunks)
+                    unique_chunks = []
+                    for chunk in cat_chunks:
+                        if chunk not in seen:
+                            seen.add(chunk)
+                            unique_chunks.append(chunk)
                     
-                    # If we got meaningful results, combine with original
-                    if cat_chunks:
-                        # Deduplicate
-                        unique_chunks = []
-                        for chunk in cat_chunks:
-                            if chunk not in chunks and chunk not in unique_chunks:
-                                unique_chunks.append(chunk)
-                        
-                        # Combine results (original first, then category-specific)
-                        combined_chunks = chunks + unique_chunks
-                        # Limit to prevent context overload
-                        chunks = combined_chunks[:top_k + 2]
+                    # Combine results (original first, then category-specific)
+                    combined_chunks = chunks + unique_chunks
+                    # Limit to prevent context overload
+                    chunks = combined_chunks[:top_k + 2]
             
-            # If we still don't have much information, try the original query as fallback
-            if len("".join(chunks)) < 100 and enhanced_query != original_query:
-                orig_emb = cached_embed_query(original_query)
-                result = conn.execute(
-                    text("""
-                        SELECT content
-                        FROM embeddings
-                        WHERE tenant_id = :tenant
-                        ORDER BY embedding <-> (:query_emb)::vector
-                        LIMIT :top_k
-                    """),
-                    {"tenant": tenant_id, "query_emb": orig_emb, "top_k": top_k}
-                )
-                orig_chunks = [row[0] for row in result]
-                if len("".join(orig_chunks)) > len("".join(chunks)):
+            # If we still don't have much information, try the original query as fallback;
+            # normalized hits are kept even when short, since they matched on structure
+            if not has_normalized_data and sum(map(len, chunks)) < 100 and enhanced_query != original_query:
+                # Without normalized data the original query's results came back with the first search
+                if sum(map(len, orig_chunks)) > sum(map(len, chunks)):
                     chunks = orig_chunks
                     
             return chunks
@@ -163,60 +330,76 @@ def extract_contact_info(context_chunks):
         "addresses": []
     }
     
-    # Regular expressions for contact information
-    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    phone_pattern = r'\b(\(\d{3}\)\s*|\d{3}[-.])\d{3}[-.]?\d{4}\b|\b\d{3}[-.]?\d{3}[-.]?\d{4}\b'
-    url_pattern = r'https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+'
-    
     # Look for normalized sections first
     for chunk in context_chunks:
-        if "CONTACT INFORMATION:" in chunk:
-            # Extract information from structured data
-            lines = chunk.split('\n')
-            for i, line in enumerate(lines):
-                if "Email:" in line:
-                    contact_info["emails"].extend(re.findall(email_pattern, line))
-                elif "Phone:" in line:
-                    contact_info["phones"].extend(re.findall(phone_pattern, line))
-                elif "Website:" in line or "URL:" in line:
-                    contact_info["websites"].extend(re.findall(url_pattern, line))
-                elif "Address:" in line and i+1 < len(lines):
-                    # Address might span multiple lines
-                    contact_info["addresses"].append(lines[i].replace("Address:", "").strip())
-                    if i+1 < len(lines) and not any(k in lines[i+1] for k in ["Email:", "Phone:", "Website:", "DESCRIPTION:"]):
-                        contact_info["addresses"].append(lines[i+1].strip())
+        for key, values in _chunk_fields(chunk)["contact"].items():
+            contact_info[key].extend(values)
     
     # If structured data wasn't found, extract from raw text
     if not any(contact_info.values()):
         for chunk in context_chunks:
-            contact_info["emails"].extend(re.findall(email_pattern, chunk))
-            contact_info["phones"].extend(re.findall(phone_pattern, chunk))
-            contact_info["websites"].extend(re.findall(url_pattern, chunk))
+            for key, values in _chunk_fields(chunk)["raw_contact"].items():
+                contact_info[key].extend(values)
     
-    # Deduplicate
+    # Deduplicate, keeping first-seen order so answers don't vary between processes
     for key in contact_info:
-        contact_info[key] = list(set(contact_info[key]))
+        contact_info[key] = list(dict.fromkeys(contact_info[key]))
     
     return contact_info
 
 def extract_categories_from_chunks(chunks):
     """Extract categories from normalized chunks"""
-    categories = []
+    # Collect unique categories as we go, in first-seen order
+    categories = {}
     
     for chunk in chunks:
-        if "CATEGORIES:" in chunk:
-            # Extract the categories line
-            lines = chunk.split('\n')
-            for line in lines:
-                if "CATEGORIES:" in line:
-                    # Extract categories
-                    cats = line.replace("CATEGORIES:", "").strip()
-                    # Split by comma and clean
-                    cat_list = [c.strip() for c in cats.split(',')]
-                    categories.extend(cat_list)
-    
-    # Return unique categories
-    return list(set(categories))
+        categories.update(dict.fromkeys(_chunk_fields(chunk)["categories"]))
+    
+    return list(categories)
+
+def _budget_context(context_chunks):
+    """Drop duplicate chunks and keep whole chunks, in order, within ANSWER_CONTEXT_CHARS"""
+    budgeted = []
+    used = 0
+    for chunk in dict.fromkeys(context_chunks):
+        # Always keep the best-ranked chunk, even if it alone exceeds the budget
+        if budgeted and used + len(chunk) > ANSWER_CONTEXT_CHARS:
+            break
+        budgeted.append(chunk)
+        used += len(chunk)
+    return budgeted
+
+@st.cache_resource
+def get_answer_cache():
+    """Process-wide semantic answer cache: context hash -> [(question vector, answer, created)]"""
+    return {"entries": OrderedDict(), "lock": threading.Lock()}
+
+def _lookup_cached_answer(context_key, question_vec):
+    """Return a fresh cached answer for a similar question over the same context"""
+    cache = get_answer_cache()
+    now = time.time()
+    with cache["lock"]:
+        entries = cache["entries"].get(context_key)
+        if not entries:
+            return None
+        cache["entries"].move_to_end(context_key)
+        # Query vectors are unit-normalized, so the dot product is cosine similarity
+        for cached_vec, answer, created in entries:
+            if now - created < ANSWER_CACHE_TTL and float(cached_vec @ question_vec) >= ANSWER_CACHE_THRESHOLD:
+                return answer
+    return None
+
+def _store_cached_answer(context_key, question_vec, answer):
+    """Remember an answer, evicting expired entries and the least recently used contexts"""
+    cache = get_answer_cache()
+    now = time.time()
+    with cache["lock"]:
+        entries = [entry for entry in cache["entries"].get(context_key, []) if now - entry[2] < ANSWER_CACHE_TTL]
+        entries.append((question_vec, answer, now))
+        cache["entries"][context_key] = entries[-ANSWER_CACHE_PER_CONTEXT:]
+        cache["entries"].move_to_end(context_key)
+        while len(cache["entries"]) > ANSWER_CACHE_MAX_CONTEXTS:
+            cache["entries"].popitem(last=False)
 
 def generate_answer(question, context_chunks):
     """Generate answer using Ollama with streaming support"""
@@ -224,17 +407,27 @@ def generate_answer(question, context_chunks):
     if not context_chunks:
         return "No provider information found for this query."
     
-    # Extract structured data
-    question_categories = detect_category_in_query(question)
-    chunk_categories = extract_categories_from_chunks(context_chunks)
-    contact_info = extract_contact_info(context_chunks)
-    
-    # Combine categories
-    all_categories = list(set(question_categories + chunk_categories))
+    context_chunks = _budget_context(context_chunks)
     
-    # Prepare context for the model
+    # Prepare context for the model; the same string keys the answer cache
     context = "\n---\n".join(context_chunks)
     
+    # Paraphrases of an earlier question over the same context reuse its answer
+    context_key = hashlib.sha256(context.encode("utf-8")).hexdigest()
+    try:
+        question_vec = np.asarray(cached_embed_query(question), dtype=np.float32)
+    except Exception as e:
+        print(f"Error embedding question for answer cache: {str(e)}")
+        question_vec = None
+    
+    if question_vec is not None:
+        cached_answer = _lookup_cached_answer(context_key, question_vec)
+        if cached_answer is not None:
+            return cached_answer
+    
+    # Extract structured data; categories are only needed by the fallback below
+    contact_info = extract_contact_info(context_chunks)
+    
     # Create prompt
     prompt = f"""Based on the following context, answer the question clearly and concisely.
 
@@ -253,13 +446,13 @@ Answer:"""
 
     try:
         # Call Ollama API
-        response = ollama.chat(
+        response = get_chat_client().chat(
             model=get_chat_model(),
             messages=[
                 {'role': 'system', 'content': 'You are a helpful assistant that provides information based on the given context. Be concise and accurate.'},
                 {'role': 'user', 'content': prompt}
             ],
-            options={'host': get_ollama_host()}
+            keep_alive=CHAT_KEEP_ALIVE
         )
         
         generated_answer = response['message']['content']
@@ -282,11 +475,16 @@ Answer:"""
             
             generated_answer += contact_section
         
+        if question_vec is not None:
+            _store_cached_answer(context_key, question_vec, generated_answer)
         return generated_answer
         
     except Exception as e:
         print(f"Error generating answer with Ollama: {str(e)}")
         # Fallback to structured response
+        question_categories = detect_category_in_query(question)
+        chunk_categories = extract_categories_from_chunks(context_chunks)
+        all_categories = list(dict.fromkeys(question_categories + chunk_categories))
         return generate_structured_answer(question, context_chunks, all_categories, contact_info)
 
 def generate_structured_answer(question, context_chunks, categories, contact_info):
@@ -319,32 +517,31 @@ def generate_structured_answer(question, context_chunks, categories, contact_inf
     # Add provider information
     providers = []
     for chunk in context_chunks:
-        if "PROVIDER:" in chunk:
-            provider = chunk.split("PROVIDER:")[1].split('\n')[0].strip()
-            if provider and provider not in providers:
-                providers.append(provider)
+        provider = _chunk_fields(chunk)["provider"]
+        if provider and provider not in providers:
+            providers.append(provider)
     
     if providers:
         response_parts.append("**Provider(s):**")
         response_parts.append(f"• {', '.join(providers)}")
         response_parts.append("")
     
-    # Add description from chunks
-    descriptions = []
+    # Add description from the first chunk that has one
+    description = None
     for chunk in context_chunks:
-        if "DESCRIPTION:" in chunk:
-            desc = chunk.split("DESCRIPTION:")[1].strip()
-            descriptions.append(desc)
-        else:
+        description = _chunk_fields(chunk)["description"]
+        if description is None:
             # Clean chunk content
             lines = [line.strip() for line in chunk.split('\n') 
-                    if line.strip() and not any(h in line for h in ["CATEGORIES:", "CONTACT INFORMATION:", "PROVIDER:"])]
+                    if line.strip() and not HEADER_LINE_RE.search(line)]
             if lines:
-                descriptions.append(' '.join(lines))
+                description = ' '.join(lines)
+        if description is not None:
+            break
     
-    if descriptions:
+    if description is not None:
         response_parts.append("**Description:**")
-        response_parts.append(descriptions[0][:200] + "..." if len(descriptions[0]) > 200 else descriptions[0])
+        response_parts.append(description[:200] + "..." if len(description) > 200 else description)
     
     return "\n".join(response_parts)
 
@@ -355,6 +552,8 @@ def stream_answer(question, context_chunks):
         yield "No provider information found for this query."
         return
     
+    context_chunks = _budget_context(context_chunks)
+    
     # Prepare context for the model
     context = "\n---\n".join(context_chunks)
     
@@ -376,14 +575,14 @@ Answer:"""
 
     try:
         # Stream response from Ollama
-        stream = ollama.chat(
+        stream = get_chat_client().chat(
             model=get_chat_model(),
             messages=[
                 {'role': 'system', 'content': 'You are a helpful assistant that provides information based on the given context. Be concise and accurate.'},
                 {'role': 'user', 'content': prompt}
             ],
             stream=True,
-            options={'host': get_ollama_host()}
+            keep_alive=CHAT_KEEP_ALIVE
         )
         
         for chunk in stream:
@@ -1,37 +1,98 @@
 import streamlit as st
-import pdfplumber
 import pandas as pd
+import numpy as np
 import io
+import hashlib
+import importlib.util
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
 from embedding import chunk_text, embed_chunks
-from db import insert_embeddings
-from extraction import extract_structured_data, normalize_text
-from llm_extraction import extract_structured_data_llm
+from db import document_exists, document_hash, insert_embeddings
 from auth import CognitoAuth
+from pdf_text import pdf_page_count, pdf_range_text, pymupdf
+
+# pandas reads workbooks through calamine (Rust) when installed; openpyxl parses the XML in Python
+EXCEL_ENGINE = 'calamine' if importlib.util.find_spec('python_calamine') else 'openpyxl'
+
+# Column types pandas infers for the dates and times pyarrow parses out of CSV text
+TEMPORAL_DTYPES = {"datetime64", "datetime", "date", "time", "timedelta64", "timedelta"}
+
+# Minimum pages per worker before PDF extraction is split across processes; PyMuPDF
+# reads hundreds of pages a second, so only very large files are worth a pool there
+PDF_PAGES_PER_WORKER = 256 if pymupdf is not None else 8
+# PDF worker processes shared by all sessions, so concurrent uploads queue rather than multiply
+PDF_WORKERS = os.cpu_count() or 1
+
+# Extracted text of recent uploads, kept in memory only and keyed by a hash of the
+# file's bytes, so re-uploads skip parsing; entries expire after the TTL (seconds)
+EXTRACT_CACHE_ENTRIES = int(os.getenv('EXTRACT_CACHE_ENTRIES', '32'))
+EXTRACT_CACHE_TTL = int(os.getenv('EXTRACT_CACHE_TTL', '3600'))
+
+@st.cache_resource
+def get_pdf_executor():
+    """Process pool for PDF page ranges, created once per server process"""
+    # forkserver rather than the Linux default fork: forking the threaded server would copy
+    # its held locks, database pool and HTTP clients into every worker
+    return ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("forkserver"))
 
 def extract_pdf_text(pdf_file):
     """Extract text from a PDF file"""
-    with pdfplumber.open(pdf_file) as pdf:
-        full_text = ""
-        for page in pdf.pages:
-            full_text += page.extract_text() + "\n"
-    return full_text
+    data = pdf_file.read()
+    page_count = pdf_page_count(data)
+    workers = min(PDF_WORKERS, page_count // PDF_PAGES_PER_WORKER)
+    if workers < 2:
+        return pdf_range_text(data, 0, page_count)
+    
+    # Workers read the PDF from a temp file, so the bytes aren't pickled into every task.
+    # Pages parse independently, so each task gets a contiguous range; map keeps page order
+    bounds = [page_count * i // workers for i in range(workers + 1)]
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as pdf_tmp:
+        pdf_tmp.write(data)
+        pdf_tmp.flush()
+        for attempt in range(2):
+            executor = get_pdf_executor()
+            try:
+                texts = executor.map(pdf_range_text, repeat(pdf_tmp.name), bounds[:-1], bounds[1:])
+                return "".join(texts)
+            except BrokenProcessPool:
+                # A dead worker (OOM, crash on a bad file) breaks the pool for good;
+                # drop it so this retry and later uploads get a fresh one
+                if get_pdf_executor() is executor:
+                    get_pdf_executor.clear()
+                executor.shutdown(wait=False, cancel_futures=True)
+                if attempt:
+                    raise
+
+def dataframe_to_text(df):
+    """Format each row as "column: value" lines, skipping missing values, with a blank line between rows"""
+    # Build each column's lines with Series ops and concatenate column-wise, instead of
+    # materializing a Series per row with iterrows
+    rows = np.full(len(df), "", dtype=object)
+    for i, col in enumerate(df.columns):
+        values = df.iloc[:, i]
+        lines = (f"{col}: " + values.map(str) + "\n").where(values.notna(), "")
+        rows = rows + lines.to_numpy(dtype=object)
+    return "\n\n".join(rows)
 
 def extract_csv_text(csv_file):
     """Extract and format text from a CSV file"""
     try:
-        df = pd.read_csv(csv_file)
+        try:
+            # pyarrow parses on all cores; it rejects some files the C parser accepts (e.g. ragged rows)
+            df = pd.read_csv(csv_file, engine='pyarrow')
+            # pyarrow also parses date/time-like columns, which would reformat their text
+            # (2024-01-01 10:00 -> 2024-01-01 10:00:00); the C parser keeps them as written
+            if any(pd.api.types.infer_dtype(df[col], skipna=True) in TEMPORAL_DTYPES for col in df.columns):
+                raise ValueError("temporal columns")
+        except (ImportError, ValueError):
+            csv_file.seek(0)
+            df = pd.read_csv(csv_file)
         # Convert DataFrame to a structured text format
-        text_chunks = []
-        
-        for _, row in df.iterrows():
-            # Create a text representation of each row
-            chunk = ""
-            for col in df.columns:
-                if pd.notna(row[col]):
-                    chunk += f"{col}: {row[col]}\n"
-            text_chunks.append(chunk)
-            
-        return "\n\n".join(text_chunks)
+        return dataframe_to_text(df)
     except Exception as e:
         st.error(f"Error processing CSV: {str(e)}")
         return ""
@@ -39,35 +100,80 @@ def extract_csv_text(csv_file):
 def extract_excel_text(excel_file):
     """Extract and format text from an Excel file"""
     try:
-        df = pd.read_excel(excel_file, engine='openpyxl')
+        df = pd.read_excel(excel_file, engine=EXCEL_ENGINE)
         # Convert DataFrame to a structured text format
-        text_chunks = []
-        
-        for _, row in df.iterrows():
-            # Create a text representation of each row
-            chunk = ""
-            for col in df.columns:
-                if pd.notna(row[col]):
-                    chunk += f"{col}: {row[col]}\n"
-            text_chunks.append(chunk)
-            
-        return "\n\n".join(text_chunks)
+        return dataframe_to_text(df)
     except Exception as e:
         st.error(f"Error processing Excel file: {str(e)}")
         return ""
 
+def decode_text(content):
+    """Decode file bytes as UTF-8 (dropping any BOM), detecting the encoding only when that fails"""
+    try:
+        return content.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        # e.g. cp1252 files exported from Windows editors
+        from charset_normalizer import from_bytes
+        match = from_bytes(content).best()
+        if match is None:
+            return content.decode('utf-8', errors='replace')
+        return str(match)
+
 def extract_text_file(text_file):
     """Extract text from a plain text file"""
     try:
         # Read the text file
         content = text_file.read()
         if isinstance(content, bytes):
-            content = content.decode('utf-8')
+            content = decode_text(content)
         return content
     except Exception as e:
         st.error(f"Error processing text file: {str(e)}")
         return ""
 
+# Extractor for each file type offered in the upload forms
+EXTRACTORS = {
+    "PDF": extract_pdf_text,
+    "CSV": extract_csv_text,
+    "Excel": extract_excel_text,
+    "Text": extract_text_file
+}
+
+# File type for each accepted extension; anything else is read as text (txt, md, rst)
+FILE_TYPES = {"pdf": "PDF", "csv": "CSV", "xlsx": "Excel", "xls": "Excel"}
+
+def detect_file_type(filename):
+    """Upload file type for a filename, from its extension"""
+    return FILE_TYPES.get(filename.rsplit('.', 1)[-1].lower(), "Text")
+
+def extract_file_text(uploaded_file, file_type):
+    """
+    Extract text from an uploaded file of the given type, reusing the text
+    of a recent upload with identical bytes
+    """
+    # Reruns with the same upload reuse the session's text without reading or hashing the file again
+    cached = st.session_state.get('extracted_file')
+    if cached is not None and cached[:2] == (uploaded_file.file_id, file_type):
+        return cached[2]
+    data = uploaded_file.getvalue()
+    text = _extract_file_text(hashlib.sha256(data).hexdigest(), file_type, data)
+    st.session_state.extracted_file = (uploaded_file.file_id, file_type, text)
+    return text
+
+@st.cache_data(max_entries=EXTRACT_CACHE_ENTRIES, ttl=EXTRACT_CACHE_TTL, show_spinner=False)
+def _extract_file_text(key, file_type, _data):
+    """Text of a file's bytes; cached by the content hash in key, so _data isn't hashed again"""
+    return EXTRACTORS[file_type](io.BytesIO(_data))
+
+def get_word_count(text):
+    """Word count of a text, remembered for the session's latest text so reruns don't re-split it"""
+    # Holds a reference to the text, so an unchanged text compares by identity
+    cached = st.session_state.get('word_count_cache')
+    if cached is None or cached[0] != text:
+        cached = (text, len(text.split()))
+        st.session_state.word_count_cache = cached
+    return cached[1]
+
 def upload_page():
     st.title("📄 Upload Documents")
     
@@ -93,23 +199,23 @@ def upload_page():
     if file_type == "PDF":
         uploaded_file = st.file_uploader("Upload a PDF file", type=["pdf"])
         if uploaded_file:
-            full_text = extract_pdf_text(uploaded_file)
-            st.success(f"Extracted {len(full_text.split())} words from PDF.")
+            full_text = extract_file_text(uploaded_file, "PDF")
+            st.success(f"Extracted {get_word_count(full_text)} words from PDF.")
     elif file_type == "CSV":
         uploaded_file = st.file_uploader("Upload a CSV file", type=["csv"])
         if uploaded_file:
-            full_text = extract_csv_text(uploaded_file)
-            st.success(f"Processed CSV data with {len(full_text.split())} words.")
+            full_text = extract_file_text(uploaded_file, "CSV")
+            st.success(f"Processed CSV data with {get_word_count(full_text)} words.")
     elif file_type == "Excel":
         uploaded_file = st.file_uploader("Upload an Excel file", type=["xlsx", "xls"])
         if uploaded_file:
-            full_text = extract_excel_text(uploaded_file)
-            st.success(f"Processed Excel data with {len(full_text.split())} words.")
+            full_text = extract_file_text(uploaded_file, "Excel")
+            st.success(f"Processed Excel data with {get_word_count(full_text)} words.")
     else:  # Text
         uploaded_file = st.file_uploader("Upload a text file", type=["txt", "md", "rst"])
         if uploaded_file:
-            full_text = extract_text_file(uploaded_file)
-            st.success(f"Processed text file with {len(full_text.split())} words.")
+            full_text = extract_file_text(uploaded_file, "Text")
+            st.success(f"Processed text file with {get_word_count(full_text)} words.")
     
     if uploaded_file and full_text:
         # Add option for structured data extraction
@@ -128,6 +234,10 @@ def upload_page():
         if st.button("Extract and Preview Data"):
             with st.spinner("Processing document..."):
                 if use_structured_extraction:
+                    # Imported on first use: extraction loads the spaCy model at import
+                    from extraction import extract_structured_data, normalize_text
+                    from llm_extraction import extract_structured_data_llm
+                    
                     if extraction_method == "llm":
                         st.info("Extracting structured data using LLM...")
                         extracted_data = extract_structured_data_llm(full_text, file_type.lower())
@@ -137,6 +247,7 @@ def upload_page():
                     
                     # Store in session state for later use
                     st.session_state.extracted_data = extracted_data
+                    st.session_state.normalized_text = normalize_text(extracted_data)
                     st.session_state.full_text = full_text
                     st.session_state.use_structured = True
                     st.session_state.extraction_method = extraction_method
@@ -201,13 +312,11 @@ def show_data_preview(extracted_data, full_text, extraction_method="traditional"
         })
     
     if preview_data:
-        df = pd.DataFrame(preview_data)
-        st.table(df)
+        st.table(preview_data)
         
         # Show normalized text preview
-        normalized_text = normalize_text(extracted_data)
         with st.expander("View Normalized Text (what will be embedded)"):
-            st.text_area("Normalized text:", normalized_text, height=200, disabled=True)
+            st.text_area("Normalized text:", st.session_state.normalized_text, height=200, disabled=True)
     else:
         st.warning("No structured data could be extracted from this document.")
         st.info("Consider uploading without structured extraction or try a different document.")
@@ -216,7 +325,7 @@ def show_raw_text_preview(full_text):
     """Display preview of raw text chunks"""
     st.subheader("📋 Raw Text Preview")
     
-    chunks = chunk_text(full_text)
+    chunks = get_upload_chunks()
     
     preview_data = []
     for i, chunk in enumerate(chunks[:5]):  # Show first 5 chunks
@@ -226,8 +335,7 @@ def show_raw_text_preview(full_text):
             "Length": len(chunk.split())
         })
     
-    df = pd.DataFrame(preview_data)
-    st.table(df)
+    st.table(preview_data)
     
     if len(chunks) > 5:
         st.info(f"Showing first 5 of {len(chunks)} total chunks")
@@ -235,6 +343,25 @@ def show_raw_text_preview(full_text):
     with st.expander("View Full Text Sample"):
         st.text_area("Full text (first 1000 chars):", full_text[:1000], height=200, disabled=True)
 
+def get_upload_chunks():
+    """Chunks of the text to embed, computed once per text across the preview, reruns and embedding"""
+    if st.session_state.use_structured:
+        text = st.session_state.normalized_text
+    else:
+        text = st.session_state.full_text
+    # Holds a reference to the text, so an unchanged text compares by identity
+    cached = st.session_state.get('upload_chunks')
+    if cached is None or cached[0] != text:
+        cached = (text, chunk_text(text))
+        st.session_state.upload_chunks = cached
+    return cached[1]
+
+def clear_upload_state():
+    """Forget the processed upload and everything derived from it"""
+    for key in ('extracted_data', 'normalized_text', 'full_text', 'use_structured', 'upload_chunks'):
+        if key in st.session_state:
+            del st.session_state[key]
+
 def show_embedding_confirmation(tenant_id):
     """Show confirmation buttons to proceed with embedding"""
     st.subheader("🚀 Ready to Embed")
@@ -244,35 +371,24 @@ def show_embedding_confirmation(tenant_id):
     with col1:
         if st.button("✅ Accept and Embed Data", type="primary", use_container_width=True):
             with st.spinner("Embedding and storing data..."):
-                if st.session_state.use_structured:
-                    normalized_text = normalize_text(st.session_state.extracted_data)
-                    chunks = chunk_text(normalized_text)
+                chunks = get_upload_chunks()
+                doc_hash = document_hash(chunks)
+                if document_exists(tenant_id, doc_hash):
+                    st.info("This document is already in your workspace, so nothing new was added.")
                 else:
-                    chunks = chunk_text(st.session_state.full_text)
-                
-                records = embed_chunks(chunks, tenant_id)
-                insert_embeddings(records)
-                
-                st.success("✅ Data successfully embedded and stored!")
-                st.balloons()
+                    records = embed_chunks(chunks, tenant_id)
+                    insert_embeddings(records, doc_hash)
+                    
+                    st.success("✅ Data successfully embedded and stored!")
+                    st.balloons()
                 
                 # Clear session state
-                if 'extracted_data' in st.session_state:
-                    del st.session_state.extracted_data
-                if 'full_text' in st.session_state:
-                    del st.session_state.full_text
-                if 'use_structured' in st.session_state:
-                    del st.session_state.use_structured
+                clear_upload_state()
     
     with col2:
         if st.button("❌ Cancel", use_container_width=True):
             # Clear session state
-            if 'extracted_data' in st.session_state:
-                del st.session_state.extracted_data
-            if 'full_text' in st.session_state:
-                del st.session_state.full_text
-            if 'use_structured' in st.session_state:
-                del st.session_state.use_structured
+            clear_upload_state()
             
             st.info("Process cancelled. You can upload a different file or try again.")
             st.rerun()
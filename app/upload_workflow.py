@@ -1,14 +1,28 @@
 import streamlit as st
-import pdfplumber
-import pandas as pd
-import io
 from embedding import chunk_text, embed_chunks
-from db import insert_embeddings
-from extraction import extract_structured_data, normalize_text
-from llm_extraction import extract_structured_data_llm
+from db import document_exists, document_hash, insert_embeddings
 from auth import CognitoAuth
+from upload import detect_file_type, extract_file_text, get_word_count
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
 import time
 
+# Documents embedded and stored at once in the background, across all sessions
+SAVE_WORKERS = int(os.getenv('UPLOAD_SAVE_WORKERS', '2'))
+# Seconds between status checks while a document is being saved
+SAVE_POLL_SECONDS = 1
+
+@st.cache_resource
+def get_save_executor():
+    """Thread pool that embeds and stores confirmed documents off the page's script run"""
+    return ThreadPoolExecutor(max_workers=SAVE_WORKERS, thread_name_prefix="upload-save")
+
+@st.cache_resource
+def get_save_jobs():
+    """In-flight save jobs by key, with the lock guarding them"""
+    return {}, threading.Lock()
+
 def upload_workflow_page():
     """Main upload workflow with paginated onboarding-style interface"""
     
@@ -71,30 +85,14 @@ def step_1_upload():
     
     # Auto-detect file type from upload
     if uploaded_file:
-        file_extension = uploaded_file.name.split('.')[-1].lower()
-        if file_extension == 'pdf':
-            file_type = "PDF"
-        elif file_extension == 'csv':
-            file_type = "CSV"
-        elif file_extension in ['xlsx', 'xls']:
-            file_type = "Excel"
-        else:  # txt, md, rst
-            file_type = "Text"
-        
+        file_type = detect_file_type(uploaded_file.name)
         st.session_state.workflow_data['file_type'] = file_type
         st.success(f"📋 Detected format: **{file_type}**")
     
     if uploaded_file:
         # Extract text based on file type
         with st.spinner("Reading document..."):
-            if file_type == "PDF":
-                full_text = extract_pdf_text(uploaded_file)
-            elif file_type == "CSV":
-                full_text = extract_csv_text(uploaded_file)
-            elif file_type == "Excel":
-                full_text = extract_excel_text(uploaded_file)
-            else:  # Text
-                full_text = extract_text_file(uploaded_file)
+            full_text = extract_file_text(uploaded_file, file_type)
         
         if full_text:
             # Store in workflow data
@@ -106,7 +104,7 @@ def step_1_upload():
             with col1:
                 st.metric("File Size", f"{uploaded_file.size:,} bytes")
             with col2:
-                st.metric("Word Count", f"{len(full_text.split()):,}")
+                st.metric("Word Count", f"{get_word_count(full_text):,}")
             with col3:
                 st.metric("Character Count", f"{len(full_text):,}")
             
@@ -140,7 +138,7 @@ def step_2_configure():
     st.session_state.workflow_data['extraction_method'] = 'llm'
     
     # Get word count for intelligent chunking
-    word_count = len(st.session_state.workflow_data.get('full_text', '').split())
+    word_count = get_word_count(st.session_state.workflow_data.get('full_text', ''))
     
     # Intelligent chunking based on document size
     st.write("**📄 Intelligent Text Processing:**")
@@ -215,6 +213,10 @@ def step_3_preview():
     # Process the data
     if 'processed_data' not in st.session_state.workflow_data:
         with st.spinner("Processing document with AI extraction..."):
+            # Imported on first use: extraction loads the spaCy model at import
+            from extraction import normalize_text
+            from llm_extraction import extract_structured_data_llm
+            
             # Always use LLM extraction
             extracted_data = extract_structured_data_llm(
                 st.session_state.workflow_data['full_text'],
@@ -232,12 +234,11 @@ def step_3_preview():
     
     # Show chunking preview with configured chunk size
     chunk_size = st.session_state.workflow_data.get('chunk_size', 300)
-    chunks = chunk_text(st.session_state.workflow_data['final_text'], chunk_size=chunk_size)
+    chunks = get_workflow_chunks()
     st.write(f"**📄 Text will be split into {len(chunks)} chunks for embedding**")
     
     # Show chunking details
-    actual_chunk_sizes = [len(chunk.split()) for chunk in chunks]
-    avg_chunk_size = sum(actual_chunk_sizes) / len(actual_chunk_sizes) if chunks else 0
+    avg_chunk_size = get_average_chunk_words(chunks)
     
     col1, col2, col3 = st.columns(3)
     with col1:
@@ -286,7 +287,7 @@ def step_4_confirm():
             st.write("• Method: LLM-based extraction")
             
             chunk_size = st.session_state.workflow_data.get('chunk_size', 300)
-            chunks = chunk_text(st.session_state.workflow_data.get('final_text', ''), chunk_size=chunk_size)
+            chunks = get_workflow_chunks()
             st.write(f"• Chunks: {len(chunks)} pieces")
             st.write(f"• Chunk Size: ~{chunk_size} words")
             strategy = st.session_state.workflow_data.get('chunking_strategy', 'Intelligent chunking')
@@ -308,10 +309,33 @@ def step_4_confirm():
 
 def step_5_complete():
     """Step 5: Completion Status"""
+    job = st.session_state.workflow_data.get('save_job')
+    if job is not None:
+        if not job.done():
+            st.title("⏳ Saving Your Document")
+            st.info("Your document is being embedded and saved to the knowledge base. You can keep using the app while this finishes.")
+            time.sleep(SAVE_POLL_SECONDS)
+            st.rerun()
+        
+        error = job.exception()
+        if error is not None:
+            st.error(f"Error processing document: {str(error)}")
+            if st.button("← Back to Confirm", use_container_width=True):
+                del st.session_state.workflow_data['save_job']
+                st.session_state.workflow_step = 4
+                st.rerun()
+            return
+        
+        st.session_state.workflow_data['processing_results'] = job.result()
+        del st.session_state.workflow_data['save_job']
+    
     st.title("🎉 Upload Complete!")
     
     # Success message
-    st.success("Your document has been successfully processed and added to the knowledge base!")
+    if st.session_state.workflow_data.get('processing_results', {}).get('already_saved'):
+        st.info("This document is already in your knowledge base, so nothing new was added.")
+    else:
+        st.success("Your document has been successfully processed and added to the knowledge base!")
     
     # Show processing results
     if 'processing_results' in st.session_state.workflow_data:
@@ -344,49 +368,68 @@ def step_5_complete():
         if st.button("📊 View All Documents", use_container_width=True):
             st.info("Use the navigation menu to go to 'Document Manager' page")
 
-def process_and_save():
-    """Process and save the document with progress tracking"""
+def _embed_and_save(chunks, tenant_id, doc_hash):
+    """Embed chunks and store them for a tenant unless already stored; runs on the save executor"""
     start_time = time.time()
-    
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-    
-    try:
-        # Step 1: Chunk the text
-        status_text.text("Creating text chunks...")
-        progress_bar.progress(25)
-        chunk_size = st.session_state.workflow_data.get('chunk_size', 300)
-        chunks = chunk_text(st.session_state.workflow_data['final_text'], chunk_size=chunk_size)
-        
-        # Step 2: Generate embeddings
-        status_text.text("Generating embeddings...")
-        progress_bar.progress(50)
-        records = embed_chunks(chunks, st.session_state.workflow_data['tenant_id'])
-        
-        # Step 3: Save to database
-        status_text.text("Saving to database...")
-        progress_bar.progress(75)
-        insert_embeddings(records)
-        
-        # Step 4: Complete
-        status_text.text("Processing complete!")
-        progress_bar.progress(100)
-        
-        # Store results
-        processing_time = time.time() - start_time
-        st.session_state.workflow_data['processing_results'] = {
+    # A document saved before (e.g. an earlier upload of the same file) is not embedded or inserted again
+    if document_exists(tenant_id, doc_hash):
+        return {
             'chunks_count': len(chunks),
-            'embeddings_count': len(records),
-            'processing_time': processing_time
+            'embeddings_count': 0,
+            'processing_time': time.time() - start_time,
+            'already_saved': True
         }
-        
-        time.sleep(1)  # Brief pause to show completion
-        st.session_state.workflow_step = 5
-        st.rerun()
-        
-    except Exception as e:
-        st.error(f"Error processing document: {str(e)}")
-        status_text.text("Processing failed!")
+    
+    records = embed_chunks(chunks, tenant_id)
+    insert_embeddings(records, doc_hash)
+    return {
+        'chunks_count': len(chunks),
+        'embeddings_count': len(records[0]),  # one id per embedded chunk
+        'processing_time': time.time() - start_time
+    }
+
+def process_and_save():
+    """Queue the document for embedding and storage, then show its status"""
+    tenant_id = st.session_state.workflow_data['tenant_id']
+    chunks = get_workflow_chunks()
+    
+    # A double-click or retry while the same chunks are still saving for this
+    # tenant reuses that job instead of inserting the document twice
+    doc_hash = document_hash(chunks)
+    job_key = (tenant_id, doc_hash)
+    jobs, lock = get_save_jobs()
+    with lock:
+        job = jobs.get(job_key)
+        if job is None:
+            job = get_save_executor().submit(_embed_and_save, chunks, tenant_id, doc_hash)
+            jobs[job_key] = job
+            job.add_done_callback(lambda _: jobs.pop(job_key, None))
+    
+    st.session_state.workflow_data['save_job'] = job
+    st.session_state.workflow_step = 5
+    st.rerun()
+
+def get_workflow_chunks():
+    """Chunks of the workflow's final text, computed once per text and chunk size across steps and reruns"""
+    workflow_data = st.session_state.workflow_data
+    # The key holds a reference to the text, not a copy, and an unchanged text compares by identity
+    key = (workflow_data.get('final_text', ''), workflow_data.get('chunk_size', 300))
+    cached = workflow_data.get('chunks_cache')
+    if cached is None or cached[0] != key:
+        cached = (key, chunk_text(key[0], chunk_size=key[1]))
+        workflow_data['chunks_cache'] = cached
+    return cached[1]
+
+def get_average_chunk_words(chunks):
+    """Average words per chunk, counted once per chunk list rather than on every rerun of the preview"""
+    workflow_data = st.session_state.workflow_data
+    cached = workflow_data.get('chunk_words_cache')
+    # get_workflow_chunks returns the same list until the text or chunk size changes
+    if cached is None or cached[0] is not chunks:
+        average = sum(len(chunk.split()) for chunk in chunks) / len(chunks) if chunks else 0
+        cached = (chunks, average)
+        workflow_data['chunk_words_cache'] = cached
+    return cached[1]
 
 def reset_workflow():
     """Reset the workflow to start over"""
@@ -428,59 +471,3 @@ def show_raw_preview(text):
     """Show preview of raw text"""
     st.write("### 📄 Raw Text Preview")
     st.text_area("Document content:", text[:500] + "..." if len(text) > 500 else text, height=200, disabled=True)
-
-# Helper functions from original upload.py
-def extract_pdf_text(pdf_file):
-    """Extract text from a PDF file"""
-    with pdfplumber.open(pdf_file) as pdf:
-        full_text = ""
-        for page in pdf.pages:
-            full_text += page.extract_text() + "\n"
-    return full_text
-
-def extract_csv_text(csv_file):
-    """Extract and format text from a CSV file"""
-    try:
-        df = pd.read_csv(csv_file)
-        text_chunks = []
-        
-        for _, row in df.iterrows():
-            chunk = ""
-            for col in df.columns:
-                if pd.notna(row[col]):
-                    chunk += f"{col}: {row[col]}\n"
-            text_chunks.append(chunk)
-            
-        return "\n\n".join(text_chunks)
-    except Exception as e:
-        st.error(f"Error processing CSV: {str(e)}")
-        return ""
-
-def extract_excel_text(excel_file):
-    """Extract and format text from an Excel file"""
-    try:
-        df = pd.read_excel(excel_file, engine='openpyxl')
-        text_chunks = []
-        
-        for _, row in df.iterrows():
-            chunk = ""
-            for col in df.columns:
-                if pd.notna(row[col]):
-                    chunk += f"{col}: {row[col]}\n"
-            text_chunks.append(chunk)
-            
-        return "\n\n".join(text_chunks)
-    except Exception as e:
-        st.error(f"Error processing Excel file: {str(e)}")
-        return ""
-
-def extract_text_file(text_file):
-    """Extract text from a plain text file"""
-    try:
-        content = text_file.read()
-        if isinstance(content, bytes):
-            content = content.decode('utf-8')
-        return content
-    except Exception as e:
-        st.error(f"Error processing text file: {str(e)}")
-        return ""
\ No newline at end of file
@@ -15,6 +15,8 @@ CREATE TABLE IF NOT EXISTS embeddings (
 -- Create indexes for embeddings
 CREATE INDEX IF NOT EXISTS idx_embeddings_tenant_id ON embeddings(tenant_id);
 CREATE INDEX IF NOT EXISTS idx_embeddings_meta_data ON embeddings USING GIN(meta_data);
+-- Category pre-filter for retrieval (meta_data->'categories' ?| ...)
+CREATE INDEX IF NOT EXISTS idx_embeddings_meta_categories ON embeddings USING GIN((meta_data->'categories'));
 
 -- Documents table for file management
 CREATE TABLE IF NOT EXISTS documents (
@@ -142,8 +144,10 @@ CREATE INDEX IF NOT EXISTS idx_widget_configs_meta_data ON widget_configs USING
 
 -- High Priority Composite Indexes
 
--- 1. Embeddings vector search with tenant filtering (Most Critical for RAG performance)
-CREATE INDEX IF NOT EXISTS idx_embeddings_tenant_vector ON embeddings USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100);
+-- 1. Embeddings vector search (Most Critical for RAG performance)
+-- HNSW needs no training data, unlike ivfflat whose lists would be built from the empty table here.
+-- Existing databases: apply api/app/migrations/switch_embeddings_to_hnsw.sql
+CREATE INDEX IF NOT EXISTS idx_embeddings_embedding_hnsw ON embeddings USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
 
 -- 2. Chat session compound lookup (tenant + session_id)
 CREATE INDEX IF NOT EXISTS idx_chat_sessions_tenant_session ON chat_sessions(tenant_id, session_id);